@@ -1,11 +1,36 @@
 import json
+import math
+import os
 import pathlib
-
-from talon import Context, Module, actions, canvas, ctrl, screen, ui
-from talon.skia import Paint, Rect
-from talon.types.point import Point2d
+import tempfile
+import threading
+import time
+
+import numpy as np
+from talon import (
+    Context,
+    Module,
+    actions,
+    canvas,
+    clip,
+    cron,
+    ctrl,
+    screen,
+    settings,
+    ui,
+)
+from talon.skia import Paint, Rect, Surface
 from talon_init import TALON_HOME
 
+from . import shotbox_geometry as geometry
+from .shotbox_animate import SelectionAnimator, setting_animation_duration
+from .shotbox_annotate import annotation_kinds, draw_annotations
+from .shotbox_dedupe import CaptureIndex, setting_dedupe_mode
+from .shotbox_drag import MouseDrag
+from .shotbox_glyphs import GlyphAtlas
+from .shotbox_image import array_to_image, box_blur, image_to_array, pixelate
+from .shotbox_trace import TraceRecorder, load_trace, replay_trace, save_trace
+
 mod = Module()
 mod.tag(
     "shotbox_showing",
@@ -84,6 +109,76 @@ setting_box_color = mod.setting(
     desc="The default box color",
 )
 
+setting_screenshot_folder = mod.setting(
+    "shotbox_screenshot_folder",
+    type=str,
+    default="",
+    desc="Folder that shotbox saves captures to. Defaults to user.screenshot_folder",
+)
+
+setting_annotation_color = mod.setting(
+    "shotbox_annotation_color",
+    type=str,
+    default="#FF0000",
+    desc="The color of arrows, boxes, highlights and text added to a shot",
+)
+
+setting_redaction_style = mod.setting(
+    "shotbox_redaction_style",
+    type=str,
+    default="pixelate",
+    desc="How redacted regions are hidden in captures: pixelate or blur",
+)
+
+setting_redaction_strength = mod.setting(
+    "shotbox_redaction_strength",
+    type=int,
+    default=12,
+    desc="The pixelation block size or blur radius used for redaction",
+)
+
+setting_copy_saves = mod.setting(
+    "shotbox_copy_saves",
+    type=int,
+    default=1,
+    desc="Whether shots copied to the clipboard are also saved in the background",
+)
+
+setting_grid_labels = mod.setting(
+    "shotbox_grid_labels",
+    type=int,
+    default=1,
+    desc="Whether grid coordinates and the selection size are shown on the overlay",
+)
+
+setting_label_size = mod.setting(
+    "shotbox_label_size",
+    type=int,
+    default=12,
+    desc="The text size of grid labels and the selection size badge",
+)
+
+setting_idle_minutes = mod.setting(
+    "shotbox_idle_minutes",
+    type=int,
+    default=10,
+    desc="Idle minutes before shotbox releases cached frames and history. 0 disables",
+)
+
+setting_loupe_enabled = mod.setting(
+    "shotbox_loupe_enabled",
+    type=int,
+    default=0,
+    desc="Whether the magnifier loupe is shown next to the active edge",
+)
+
+setting_loupe_size = mod.setting(
+    "shotbox_loupe_size",
+    type=int,
+    default=160,
+    desc="The width and height of the magnifier loupe in pixels",
+)
+
 
 ctx = Context()
 
@@ -179,22 +274,27 @@ _snap_positions = {
 }
 ctx.lists["user.shotbox_snap_positions"] = _snap_positions.keys()
 
-arrow_name_steps = ["right", "down", "left", "up"]
-
-direction_vectors = [Point2d(0, 0) for _ in range(len(direction_name_steps))]
-arrow_vectors = [Point2d(0, 0) for _ in range(len(arrow_name_steps))]
-
-arrow_vectors[0] = direction_vectors[0] = Point2d(1, 0)  # east
-arrow_vectors[1] = direction_vectors[2] = Point2d(0, 1)  # south
-arrow_vectors[2] = direction_vectors[4] = Point2d(-1, 0)  # west
-arrow_vectors[3] = direction_vectors[6] = Point2d(0, -1)  # north
+# Where on the selection the handle for each direction sits, as a fraction of
+# the selection width and height
+direction_handles = {
+    "east": (1, 0.5),
+    "south east": (1, 1),
+    "south": (0.5, 1),
+    "south west": (0, 1),
+    "west": (0, 0.5),
+    "north west": (0, 0),
+    "north": (0.5, 0),
+    "north east": (1, 0),
+    "right": (1, 0.5),
+    "down": (0.5, 1),
+    "left": (0, 0.5),
+    "up": (0.5, 0),
+}
 
-# This edits all single and double entries
-for i in [1, 3, 5, 7]:
-    direction_vectors[i] = (
-        direction_vectors[(i - 1) % len(direction_vectors)]
-        + direction_vectors[(i + 1) % len(direction_vectors)]
-    ) / 2
+# Magnification factors the loupe steps through
+loupe_zoom_levels = [2, 4, 8, 16]
+# How long the overlay is hidden for before the loupe frame is grabbed
+loupe_grab_delay = "100ms"
 
 ctx.lists["self.points_of_compass"] = direction_name_steps
 ctx.lists["self.box_multipliers"] = ["double", "triple", "half"]
@@ -202,16 +302,49 @@ ctx.lists["self.box_dimensions"] = ["width", "length", "height", "all"]
 
 
 class ShotBox:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, cache_folder=None):
         self.debug = debug
         # XXX - Should this be configurable?
         self.screen_num = 1
         self.screen = None
         self.screen_rect = None
+        # Physical pixels per logical pixel on the current screen, and the
+        # same for every screen we've been set up on
+        self.scale = 1
+        self.screen_scales = {}
         self.img = None
         self.canvas = None
         self.active = False
 
+        # Annotations live on their own canvas, so that changing them doesn't
+        # redraw the overlay underneath
+        self.annotations = []
+        self.annotation_canvas = None
+        # Regions hidden in every capture, as screen-relative rectangles
+        self.redactions = []
+
+        # Loupe
+        self.loupe_enabled = setting_loupe_enabled.get() == 1
+        self.loupe_levels = []
+        self.loupe_zoom_idx = loupe_zoom_levels.index(8)
+        self.active_direction = "north west"
+
+        self.drag = MouseDrag()
+        self.animator = SelectionAnimator(self)
+
+        # Labels
+        self.labels_enabled = setting_grid_labels.get() == 1
+        self.glyphs = GlyphAtlas()
+
+        # Idle memory reclamation
+        self.last_activity = time.monotonic()
+        self.idle_job = None
+        self.history_loaded = False
+
+        # Instrumentation, mostly for trace replays
+        self.redraw_count = 0
+        self.bytes_written = 0
+
         # XXX - we don't use the next three fields atm
         self.columns = 0
         self.rows = 0
@@ -227,9 +360,12 @@ class ShotBox:
         self.screenshot_history = []
         self.screenshot_history_idx = 0
         self.cycle_direction = 1
-        self.cache_folder = pathlib.Path(TALON_HOME, "cache/shotbox/")
+        if cache_folder is None:
+            cache_folder = pathlib.Path(TALON_HOME, "cache/shotbox/")
+        self.cache_folder = cache_folder
         self.selection_history_file = self.cache_folder / "selection.json"
         self.screenshot_history_file = self.cache_folder / "screenshots.json"
+        self.capture_index = CaptureIndex(self.cache_folder / "hashes.json")
         self.init_cache()
 
         # Coordinates
@@ -241,6 +377,7 @@ class ShotBox:
     def init_cache(self):
         """Make sure all cache files and folders exist"""
         self.cache_folder.mkdir(parents=True, exist_ok=True)
+        self.history_loaded = True
         # XXX - The two below could be copied into one function...
         self.selection_history_file.touch()
         with self.selection_history_file.open() as f:
@@ -287,10 +424,17 @@ class ShotBox:
         self.img = None
         if self.canvas is not None:
             self.canvas.close()
-        self.canvas = canvas.Canvas.from_screen(selected_screen)
+        if self.annotation_canvas is not None:
+            self.annotation_canvas.close()
+        self.canvas = self.create_canvas(selected_screen)
+        self.annotation_canvas = self.create_canvas(selected_screen)
         if self.active:
             self.canvas.register("draw", self.draw_box)
-            self.canvas.freeze()
+            self.annotation_canvas.register("draw", self.draw_annotation_layer)
+            self.redraw()
+            self.redraw_annotations()
+
+        self.scale = self.screen_scale(selected_screen)
 
         self.columns = int(self.screen_rect.width // self.field_size)
         self.rows = int(self.screen_rect.height // self.field_size)
@@ -300,34 +444,176 @@ class ShotBox:
         self.max_width = self.screen_rect.width
         self.max_height = self.screen_rect.height
 
+    def screen_scale(self, selected_screen):
+        """Return the cached ratio of physical to logical pixels of a screen"""
+        rect = selected_screen.rect
+        key = (rect.x, rect.y, rect.width, rect.height)
+        if key not in self.screen_scales:
+            self.screen_scales[key] = getattr(selected_screen, "scale", 1) or 1
+        return self.screen_scales[key]
+
+    def to_physical(self, v):
+        """Convert a logical length or coordinate into whole physical pixels"""
+        return round(v * self.scale)
+
+    def to_logical(self, v):
+        """Convert whole physical pixels back into a logical length or
+        coordinate"""
+        logical = v / self.scale
+        return int(logical) if logical.is_integer() else logical
+
+    def physical_selection(self):
+        """Return the current selection as a Box of physical pixels"""
+        return self.physical_box((self.x, self.y, self.width, self.height))
+
+    def physical_box(self, pos):
+        """Convert a logical selection into a Box of physical pixels"""
+        return geometry.Box(*(self.to_physical(v) for v in pos))
+
+    def bounds(self):
+        """Return the bounds of the screen as a Box of physical pixels"""
+        return self.physical_box((0, 0, self.max_width, self.max_height))
+
+    def set_physical_selection(self, box):
+        """Set the current selection from a Box of physical pixels"""
+        self.x, self.y, self.width, self.height = (self.to_logical(v) for v in box)
+
+    def create_canvas(self, selected_screen):
+        """Create the overlay canvas for a screen"""
+        return canvas.Canvas.from_screen(selected_screen)
+
+    def redraw(self):
+        """Redraw the overlay"""
+        self.touch()
+        self.redraw_count += 1
+        self.canvas.freeze()
+
+    def redraw_annotations(self):
+        """Redraw only the annotation layer"""
+        self.redraw_count += 1
+        self.annotation_canvas.freeze()
+
+    def write_json(self, path, data):
+        """Write data to a cache file, keeping count of the bytes written"""
+        encoded = json.dumps(data)
+        with path.open("w+") as f:
+            f.write(encoded)
+        self.bytes_written += len(encoded)
+
+    def touch(self):
+        """Note shotbox activity, and make sure idle memory gets reclaimed
+        eventually"""
+        self.last_activity = time.monotonic()
+        if self.idle_job is None and setting_idle_minutes.get() > 0:
+            self.idle_job = cron.interval("30s", self.reclaim_if_idle)
+
+    def reclaim_if_idle(self):
+        """Release memory if shotbox has been idle for long enough"""
+        minutes = setting_idle_minutes.get()
+        if minutes <= 0 or self.active or self.animator.running():
+            return
+        if time.monotonic() - self.last_activity < minutes * 60:
+            return
+        self.reclaim()
+
+    def reclaim(self):
+        """Release cached frames, glyphs, leftover canvases and the in-memory
+        history. Everything is rebuilt or reloaded on next use"""
+        if self.idle_job is not None:
+            cron.cancel(self.idle_job)
+            self.idle_job = None
+        self.img = None
+        self.loupe_levels = []
+        self.glyphs.release()
+        self.capture_index.release()
+        if not self.active:
+            if self.canvas is not None:
+                self.canvas.close()
+                self.canvas = None
+            if self.annotation_canvas is not None:
+                self.annotation_canvas.close()
+                self.annotation_canvas = None
+        # The history files are always up to date, so they're the compact form
+        self.selection_history = []
+        self.selection_history_idx = 0
+        self.screenshot_history = []
+        self.screenshot_history_idx = 0
+        self.history_loaded = False
+
+    def load_history(self):
+        """Load the history from the cache files if it was reclaimed"""
+        if not self.history_loaded:
+            self.init_cache()
+
+    def memory_usage(self):
+        """Return the approximate bytes held by each in-memory cache"""
+        frame = 0
+        if self.img is not None:
+            frame = self.img.width * self.img.height * 4
+        # Each open canvas is backed by a surface the size of the screen
+        canvas_bytes = 0
+        if self.screen_rect is not None:
+            canvas_bytes = (
+                self.to_physical(self.screen_rect.width)
+                * self.to_physical(self.screen_rect.height)
+                * 4
+            )
+        annotations = [annotation.args() for annotation in self.annotations]
+        return {
+            "frame": frame,
+            "glyph_atlas": self.glyphs.nbytes(),
+            "selection_history": len(json.dumps(self.selection_history)),
+            "screenshot_history": len(json.dumps(self.screenshot_history)),
+            "capture_index": self.capture_index.nbytes(),
+            "annotations": len(json.dumps([annotations, self.redactions])),
+            "canvases": canvas_bytes
+            * ((self.canvas is not None) + (self.annotation_canvas is not None)),
+        }
+
+    def selection(self):
+        """Return the current selection, landing any animation first so it
+        is where the user asked for"""
+        self.animator.finish()
+        return (self.x, self.y, self.width, self.height)
+
     def set_selection_rect(self, rect):
         """Set the actual coordinates for the rect"""
         self.set_selection((rect.x, rect.y, rect.width, rect.height))
 
     def set_selection(self, pos):
         """Set the actual coordinates for the current selection"""
-        x, y, width, height = pos
-        self.x = min(x, self.max_x)
-        self.y = min(y, self.max_y)
-        self.width = min(width, self.max_width - self.x)
-        self.height = min(height, self.max_height - self.y)
+        # Clipping in physical pixels keeps the box on screen, covering whole
+        # pixels, and at least a pixel wide and tall
+        self.set_physical_selection(
+            geometry.clip(self.physical_box(pos), self.bounds())
+        )
 
     def show(self):
         """Show the shotbox overlay"""
         if self.active:
             return
+        self.touch()
+        self.load_history()
         self.set_selection(self.get_last_selection(direction=0))
+        if self.loupe_enabled:
+            self.capture_frame()
         self.canvas.register("draw", self.draw_box)
-        self.canvas.freeze()
+        self.annotation_canvas.register("draw", self.draw_annotation_layer)
+        self.redraw()
+        self.redraw_annotations()
         self.active = True
 
     def close(self):
         """Clear the shotbox overlay"""
         if not self.active:
             return
+        self.animator.finish()
         self.canvas.unregister("draw", self.draw_box)
         self.canvas.close()
         self.canvas = None
+        self.annotation_canvas.unregister("draw", self.draw_annotation_layer)
+        self.annotation_canvas.close()
+        self.annotation_canvas = None
         self.img = None
         self.active = False
 
@@ -341,13 +627,15 @@ class ShotBox:
 
         return (mouse_x, mouse_y)
 
-    def snap_mouse(self):
-        """Snap the current selection to the last most cursor"""
-        self.x, self.y = self.get_mouse_coordinates()
+    def move_to(self, x, y):
+        """Move the current selection to new coordinates"""
+        self.animator.finish()
+        self.x, self.y = x, y
         self.commit()
 
     def record_selection(self, pos):
         """Record the selection in the history"""
+        self.load_history()
         # If we record a new selection after a redo, we trash all previous
         # redoable entries
         if (self.selection_history_idx) != len(self.selection_history):
@@ -363,8 +651,7 @@ class ShotBox:
         self.selection_history_idx += 1
 
         # Commit to file
-        with self.selection_history_file.open("w+") as f:
-            json.dump(self.selection_history, f)
+        self.write_json(self.selection_history_file, self.selection_history)
 
     def default_selection(self):
         """Return the ordinates for the default selection"""
@@ -451,7 +738,11 @@ class ShotBox:
         LARGE_COLOR = setting_box_color.get()
         canvas.paint.antialias = False
 
-        irange = lambda start, stop, step: range(int(start), int(stop), int(step))
+        # Ticks sit on whole multiples of their spacing, so they form a fixed
+        # ruler that doesn't shift with the box
+        irange = lambda start, stop, step: range(
+            math.ceil(start / step) * step, math.ceil(stop), step
+        )
 
         rect = self.selected_rect()
         cx, cy = rect.center
@@ -465,18 +756,56 @@ class ShotBox:
             half = tick_length // 2
             canvas.paint.color = color
             # top
-            for y in irange(rect.top - margin - 1, rect.top - 1, tick_dist):
+            for y in irange(rect.top - margin, rect.top - 1, tick_dist):
                 canvas.draw_line(cx - half, y, cx + half, y)
             # bottom
-            for y in irange(rect.bot + tick_dist, rect.bot + margin + 1, tick_dist):
+            for y in irange(rect.bot + 2, rect.bot + margin + 1, tick_dist):
                 canvas.draw_line(cx - half, y, cx + half, y)
             # left
-            for x in irange(rect.left - margin - 1, rect.left - 1, tick_dist):
+            for x in irange(rect.left - margin, rect.left - 1, tick_dist):
                 canvas.draw_line(x, cy - half, x, cy + half)
             # right
-            for x in irange(rect.right + tick_dist, rect.right + margin + 1, tick_dist):
+            for x in irange(rect.right + 2, rect.right + margin + 1, tick_dist):
                 canvas.draw_line(x, cy - half, x, cy + half)
 
+        if not self.labels_enabled:
+            return
+
+        # Label the large ticks with their coordinates, which are what
+        # `edge <direction> <number>` jumps to. They're round numbers that
+        # stay put while the box moves
+        half = LARGE_LENGTH // 2
+        gap = 3
+        _, label_height = self.glyphs.measure("0")
+        for y in (
+            *irange(rect.top - margin, rect.top - 1, LARGE_DIST),
+            *irange(rect.bot + 2, rect.bot + margin + 1, LARGE_DIST),
+        ):
+            self.glyphs.draw(canvas, str(y), cx + half + gap, y - label_height / 2)
+        for x in (
+            *irange(rect.left - margin, rect.left - 1, LARGE_DIST),
+            *irange(rect.right + 2, rect.right + margin + 1, LARGE_DIST),
+        ):
+            label = str(x)
+            label_width, _ = self.glyphs.measure(label)
+            self.glyphs.draw(canvas, label, x - label_width / 2, cy + half + gap)
+
+    def draw_badge(self, canvas):
+        """Draw the selection size and position next to the selection"""
+        label = f"{round(self.width)}×{round(self.height)} @ {round(self.x)},{round(self.y)}"
+        label_width, label_height = self.glyphs.measure(label)
+        padding = 3
+        x = self.x
+        y = self.y - label_height - padding * 3
+        if y < 0:
+            # No room above the selection, so tuck it below
+            y = self.y + self.height + padding
+        background = Rect(x, y, label_width + padding * 2, label_height + padding * 2)
+        canvas.paint.style = Paint.Style.FILL
+        canvas.paint.color = self.overlay_color + hex_to_string(200)
+        canvas.draw_rect(background)
+        self.glyphs.draw(canvas, label, x + padding, y + padding)
+
     def draw_box(self, canvas):
         """Draw an updated canvas"""
         paint = canvas.paint
@@ -584,7 +913,160 @@ class ShotBox:
         canvas.draw_circle(self.x + (self.width / 2), self.y + self.height, 5, None)
         canvas.draw_circle(self.x + self.width, self.y + self.height, 5, None)
 
+        if self.labels_enabled:
+            self.glyphs.ensure(
+                setting_box_color.get(), setting_label_size.get(), self.scale
+            )
         self.draw_grid(canvas)
+        if self.labels_enabled:
+            self.draw_badge(canvas)
+        if self.loupe_enabled and self.img is not None:
+            self.draw_loupe(canvas)
+
+    def draw_annotation_layer(self, canvas):
+        """Draw the annotation display list"""
+        canvas.translate(self.screen_rect.x, self.screen_rect.y)
+        color = setting_annotation_color.get()
+        for x, y, width, height in self.redactions:
+            canvas.paint.style = Paint.Style.FILL
+            canvas.paint.color = self.overlay_color + hex_to_string(200)
+            canvas.draw_rect(Rect(x, y, width, height))
+            canvas.paint.style = Paint.Style.STROKE
+            canvas.paint.color = color
+            canvas.draw_rect(Rect(x, y, width, height))
+        draw_annotations(canvas, self.annotations, color)
+
+    def relative_rect(self, pos):
+        """Return the part of the current selection described by a
+        RelativeScreenPos"""
+        self.animator.finish()
+        return Rect(
+            self.x + self.width * pos.left,
+            self.y + self.height * pos.top,
+            self.width * (pos.right - pos.left),
+            self.height * (pos.bottom - pos.top),
+        )
+
+    def annotate(self, annotation):
+        """Add an annotation to the display list"""
+        self.annotations.append(annotation)
+        self.redraw_annotations()
+
+    def remove_annotation(self):
+        """Remove the most recently added annotation"""
+        if len(self.annotations) == 0:
+            return
+        self.annotations.pop()
+        self.redraw_annotations()
+
+    def clear_annotations(self):
+        """Remove all annotations"""
+        self.annotations = []
+        self.redraw_annotations()
+
+    def redact(self, pos):
+        """Hide a rectangle in every capture that contains it"""
+        self.redactions.append(tuple(pos))
+        self.redraw_annotations()
+
+    def remove_redaction(self):
+        """Remove the most recently added redaction"""
+        if len(self.redactions) == 0:
+            return
+        self.redactions.pop()
+        self.redraw_annotations()
+
+    def clear_redactions(self):
+        """Remove all redactions"""
+        self.redactions = []
+        self.redraw_annotations()
+
+    def capture_frame(self):
+        """Capture the screen under the overlay for the loupe to sample from.
+
+        This happens once per activation, so that drawing the loupe is only
+        ever a small blit out of this frame.
+        """
+        self.img = self.capture(self.screen_rect)
+        size = setting_loupe_size.get()
+        # Odd source sizes keep the handle pixel in the middle of the loupe
+        self.loupe_levels = [
+            (zoom, max(1, size // zoom) | 1) for zoom in loupe_zoom_levels
+        ]
+
+    def handle_point(self):
+        """Return the position of the handle for the last adjusted edge"""
+        fx, fy = direction_handles[self.active_direction]
+        return (self.x + self.width * fx, self.y + self.height * fy)
+
+    def draw_loupe(self, canvas):
+        """Draw a magnified view of the pixels around the active handle"""
+        zoom, source_size = self.loupe_levels[self.loupe_zoom_idx]
+        size = source_size * zoom
+        half = source_size // 2
+        hx, hy = self.handle_point()
+
+        # The frame is in physical pixels
+        source = Rect(
+            self.to_physical(hx) - half,
+            self.to_physical(hy) - half,
+            source_size,
+            source_size,
+        )
+
+        # Sit next to the handle, flipping sides near the screen edges
+        offset = 20
+        loupe_x = hx + offset
+        if loupe_x + size > self.screen_rect.width:
+            loupe_x = hx - offset - size
+        loupe_y = hy + offset
+        if loupe_y + size > self.screen_rect.height:
+            loupe_y = hy - offset - size
+        dest = Rect(loupe_x, loupe_y, size, size)
+
+        canvas.paint.antialias = False
+        canvas.draw_image_rect(self.img, source, dest)
+
+        canvas.paint.style = Paint.Style.STROKE
+        canvas.paint.color = setting_box_color.get()
+        canvas.draw_rect(dest)
+        # Outline the pixel directly under the handle
+        canvas.draw_rect(Rect(loupe_x + half * zoom, loupe_y + half * zoom, zoom, zoom))
+        canvas.paint.style = Paint.Style.FILL
+
+    def toggle_loupe(self):
+        """Toggle the magnifier loupe"""
+        self.loupe_enabled = not self.loupe_enabled
+        if self.loupe_enabled and self.img is None and self.active:
+            # The overlay and annotation layer have to be off the screen
+            # before the frame is grabbed, and hiding them doesn't take effect
+            # straight away
+            self.canvas.hide()
+            self.annotation_canvas.hide()
+            cron.after(loupe_grab_delay, self.grab_loupe_frame)
+            return
+        self.redraw()
+
+    def grab_loupe_frame(self):
+        """Capture the loupe frame while the overlay is hidden, then show the
+        overlay again"""
+        if not self.active:
+            return
+        self.capture_frame()
+        self.annotation_canvas.show()
+        self.canvas.show()
+        self.redraw()
+
+    def toggle_labels(self):
+        """Toggle the grid labels and selection size badge"""
+        self.labels_enabled = not self.labels_enabled
+        self.redraw()
+
+    def zoom_loupe(self, step):
+        """Step the loupe magnification up or down"""
+        idx = self.loupe_zoom_idx + step
+        self.loupe_zoom_idx = max(0, min(idx, len(loupe_zoom_levels) - 1))
+        self.redraw()
 
     def adjust(self, direction, size):
         """Adjust the size of the overlay in direction specified.
@@ -592,95 +1074,97 @@ class ShotBox:
         Note that the direction meaning is inverse during shrinkage, because if
         you say shrink up you don't actually want that top to shrink...
         """
+        self.animator.finish()
 
-        # No explicit direction means adjust in all directions
-        if direction == "":
-            self.x = self.x - size
-            self.y = self.y - size
-            # *2 because the sizes will already be adjusted by the new x,y
-            self.width = self.width + (size * 2)
-            self.height = self.height + (size * 2)
-        else:
-            if direction.startswith("north") or direction == "up":
-                if size < 0:
-                    # Shrinking
-                    self.height = self.height + size
-                else:
-                    # Growing
-                    self.y = self.y - size
-                    self.height = self.height + size
-            if direction.startswith("south") or direction == "down":
-                if size < 0:
-                    # Shrinking
-                    self.y = self.y - size
-                    self.height = self.height + size
-                else:
-                    # Growing
-                    self.height = self.height + size
-            if "east" in direction or direction == "right":
-                if size < 0:
-                    # Shrinking
-                    self.x = self.x - size
-                    self.width = self.width + size
-
-                else:
-                    self.width = self.width + size
-            if "west" in direction or direction == "left":
-                if size < 0:
-                    # Shrinking
-
-                    self.width = self.width + size
-                else:
-                    self.x = self.x - size
-                    self.width = self.width + size
+        self.active_direction = self.edge_direction(direction, size)
+        box = geometry.adjust(
+            self.physical_selection(), direction, self.to_physical(size)
+        )
+        self.set_physical_selection(geometry.clip(box, self.bounds()))
+        self.commit()
 
+    def edge_direction(self, direction, size):
+        """Return the direction of the edge that an adjustment actually moves"""
+        if direction == "":
+            return "north west"
+        if size >= 0:
+            return direction
+        # Shrinking moves the opposite edge
+        return geometry.OPPOSITE[direction]
+
+    def set_edge(self, direction, value):
+        """Move the edges of the selection facing a direction to a
+        coordinate, leaving the opposite edges where they are"""
+        self.animator.finish()
+        box = geometry.move_edges(
+            self.physical_selection(), direction, self.to_physical(value)
+        )
+        self.set_physical_selection(geometry.clip(box, self.bounds()))
+        self.active_direction = direction
         self.commit()
 
     def set_x(self, x):
         """Set the x coordinate of the current selection"""
+        self.animator.finish()
         self.x = x
         self.commit()
 
     def set_y(self, y):
         """Set the y coordinate of the current selection"""
+        self.animator.finish()
         self.y = y
         self.commit()
 
     def set_width(self, width):
         """Set the width of the current selection"""
+        self.animator.finish()
         self.width = width
         self.commit()
 
     def set_height(self, height):
         """Set the height of the current selection"""
+        self.animator.finish()
         self.height = height
         self.commit()
 
     def set_size(self, width, height):
         """Set the width and height of the current selection"""
+        self.animator.finish()
         self.width = width
         self.height = height
         self.commit()
 
-    def move(self, direction, count):
-        global direction_name_steps
-        global direction_vectors
-        global arrow_name_steps
-        global arrow_vectors
-        if direction in direction_name_steps:
-            index = direction_name_steps.index(direction)
-            point = direction_vectors[index]
-        else:
-            index = arrow_name_steps.index(direction)
-            point = arrow_vectors[index]
+    def multiply(self, numerator, denominator, dimension):
+        """Multiply one or both dimensions of the current selection by a
+        fraction"""
+        self.animator.finish()
+        box = geometry.multiply(
+            self.physical_selection(), numerator, denominator, dimension
+        )
+        box = geometry.clip(box, self.bounds())
+        self.animate_to(tuple(self.to_logical(v) for v in box))
 
-        self.x = self.x + (point.x * count)
-        self.y = self.y + (point.y * count)
-        self.commit()
+    def select(self, pos):
+        """Replace the current selection"""
+        self.animate_to(pos)
+
+    def animation_duration(self):
+        """Return how long in seconds selection jumps should animate for"""
+        return setting_animation_duration.get() / 1000
+
+    def animate_to(self, pos, record=True):
+        """Animate the selection to a new position, recording it in the
+        history once it gets there"""
+        self.animator.animate(tuple(pos), record)
 
-    def reset(self):
-        """Reset the selection to the default boundaries"""
-        self.set_selection(self.default_selection())
+    def move(self, direction, count):
+        self.animator.finish()
+        # The box keeps its size and stops at the edges of the screen
+        box = geometry.move(
+            self.physical_selection(), direction, self.to_physical(count)
+        )
+        self.set_physical_selection(geometry.contain(box, self.bounds()))
+        self.active_direction = direction
         self.commit()
 
     def commit(self):
@@ -688,28 +1172,211 @@ class ShotBox:
         # We do this to do a boundary sanitation pass
         self.set_selection((self.x, self.y, self.width, self.height))
         self.record_selection((self.x, self.y, self.width, self.height))
-        self.canvas.freeze()
-
-    def screenshot(self):
-        """Take a screenshot of the current selection"""
+        self.redraw()
 
+    def record_screenshot(self, pos):
+        """Record a captured selection in the screenshot history"""
+        self.touch()
+        self.load_history()
         if len(self.screenshot_history) == setting_screenshot_history_size.get():
             self.screenshot_history = self.screenshot_history[1:]
 
         # XXX - This should record this screen number and coordinates
-        self.screenshot_history.append((self.x, self.y, self.width, self.height))
+        self.screenshot_history.append(pos)
         self.screenshot_history_idx += 1
-        with self.screenshot_history_file.open("w+") as f:
-            json.dump(self.screenshot_history, f)
+        self.write_json(self.screenshot_history_file, self.screenshot_history)
+
+    def capture(self, rect=None):
+        """Grab the pixels of a rectangle, by default the current selection,
+        into an in-memory image"""
+        if rect is None:
+            rect = self.unclipped_rect()
+        # Native resolution means the capture is a straight crop of the
+        # framebuffer, with no resampling on HiDPI screens
+        return screen.capture_rect(rect, retina=True)
+
+    def capture_folder(self):
+        """Return the folder captures are saved to"""
+        folder = setting_screenshot_folder.get()
+        if not folder:
+            # Save alongside the community screenshots when it's installed
+            try:
+                folder = settings.get("user.screenshot_folder")
+            except Exception:
+                folder = None
+        if folder:
+            return pathlib.Path(folder).expanduser()
+        return pathlib.Path.home() / "Pictures"
+
+    def find_duplicate(self, img):
+        """Hash a processed capture, and look for a recent capture it
+        duplicates. Returns the hash and the path of the duplicate, if any"""
+        digest = self.capture_index.hash(img)
+        return digest, self.capture_index.find(digest, img)
+
+    def save_capture(self, img, digest=None, duplicate=None):
+        """Write a captured image to the screenshot folder.
+
+        A duplicate of a recent capture is either not written at all, or hard
+        linked to the existing file, depending on shotbox_dedupe_mode.
+        """
+        if duplicate is not None and setting_dedupe_mode.get() != "link":
+            return duplicate
+        path = screenshot_path(self.capture_folder())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if duplicate is not None:
+            try:
+                os.link(duplicate, path)
+                return path
+            except OSError:
+                # Not every filesystem supports hard links, so write a copy
+                pass
+        img.write_file(str(path))
+        self.bytes_written += path.stat().st_size
+        self.bytes_written += self.capture_index.add(digest, img, path)
+        return path
+
+    def process_capture(self, img, selection):
+        """Apply everything that has to end up in a capture before it is
+        saved anywhere"""
+        img = self.apply_redactions(img, selection)
+        return self.composite_annotations(img, selection)
+
+    def apply_redactions(self, img, selection):
+        """Pixelate or blur redacted regions of a captured image in memory"""
+        if len(self.redactions) == 0:
+            return img
+        x, y, _, _ = selection
+        arr = image_to_array(img).copy()
+        strength = max(1, self.to_physical(setting_redaction_strength.get()))
+        hide = box_blur if setting_redaction_style.get() == "blur" else pixelate
+        for redact_x, redact_y, redact_width, redact_height in self.redactions:
+            hide(
+                arr,
+                self.to_physical(redact_x - x),
+                self.to_physical(redact_y - y),
+                self.to_physical(redact_width),
+                self.to_physical(redact_height),
+                strength,
+            )
+        return array_to_image(arr)
+
+    def composite_annotations(self, img, selection):
+        """Draw the annotation display list directly into a captured image"""
+        if len(self.annotations) == 0:
+            return img
+        x, y, _, _ = selection
+        surface = Surface(img.width, img.height)
+        canvas = surface.canvas()
+        canvas.draw_image(img, 0, 0)
+        # Captures are in physical pixels, annotations in logical ones
+        canvas.scale(self.scale, self.scale)
+        canvas.translate(-x, -y)
+        draw_annotations(canvas, self.annotations, setting_annotation_color.get())
+        return surface.snapshot()
+
+    def take_capture(self):
+        """Capture the current selection into a processed in-memory image.
+        Returns the image and the selection it shows"""
+        selection = self.selection()
 
         # XXX - if I don't just completely disable it, it seems to race with
         # this screenshot taking and sleeps are not super reliable (unless
         # their painfully long)
         self.disable()
-        rect = self.unclipped_rect()
-        actions.user.screenshot_rect(rect, screen_num=self.screen_num)
+        img = self.process_capture(self.capture(self.unclipped_rect()), selection)
+        return img, selection
+
+    def record_capture(self, selection):
+        """Record a taken capture in the screenshot history, so cycling
+        starts again from it"""
+        self.record_screenshot(selection)
         self.screenshot_history_idx = -1
 
+    def save_deduplicated(self, img):
+        """Save a captured image unless it duplicates a recent capture.
+        Returns the saved path and the duplicated path, if any"""
+        digest, duplicate = self.find_duplicate(img)
+        return self.save_capture(img, digest, duplicate), duplicate
+
+    def copy_to_clipboard(self, img):
+        """Put an image on the clipboard"""
+        clip.set_image(img)
+
+    def screenshot_rect(self, rect):
+        """Save a screenshot of a rect with the community screenshot action"""
+        actions.user.screenshot_rect(rect, screen_num=self.screen_num)
+
+    def screenshot(self):
+        """Take a screenshot of the current selection"""
+        start = time.perf_counter()
+        if (
+            len(self.annotations) == 0
+            and len(self.redactions) == 0
+            and setting_dedupe_mode.get() == "off"
+        ):
+            # Nothing has to be drawn into or hashed from the capture, so the
+            # community screenshot action can save it, with its flash and
+            # notification
+            selection = self.selection()
+            self.disable()
+            self.screenshot_rect(self.unclipped_rect())
+            self.record_capture(selection)
+        else:
+            img, selection = self.take_capture()
+            path, duplicate = self.save_deduplicated(img)
+            # A duplicate isn't a new capture to cycle back to
+            if duplicate is None:
+                self.record_capture(selection)
+            actions.app.notify(self.save_message(path, duplicate))
+        if self.debug:
+            print(f"Screenshot saved in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def copy_screenshot(self):
+        """Copy a screenshot of the current selection straight to the
+        clipboard, optionally saving it in the background afterwards"""
+        start = time.perf_counter()
+        img, selection = self.take_capture()
+        self.copy_to_clipboard(img)
+        if self.debug:
+            print(f"Screenshot copied in {(time.perf_counter() - start) * 1000:.1f}ms")
+        if setting_copy_saves.get() == 1:
+            # Whether it's a duplicate is only known once it has been hashed
+            self.save_in_background(img, selection)
+        else:
+            self.record_capture(selection)
+
+    def save_message(self, path, duplicate):
+        """Describe where a saved capture ended up, so a duplicate is never
+        dropped silently"""
+        if duplicate is None:
+            return f"Shotbox saved {path.name}"
+        if path == duplicate:
+            return f"Shotbox didn't save a duplicate of {duplicate.name}"
+        return f"Shotbox saved {path.name}, a duplicate of {duplicate.name}"
+
+    def save_in_background(self, img, selection):
+        """Hash and save a copied capture without blocking"""
+        # Hashing and encoding the PNG are the slow parts, and nothing waits
+        # on them
+        threading.Thread(
+            target=self.save_copy, args=(img, selection), daemon=True
+        ).start()
+
+    def save_copy(self, img, selection):
+        """Save a copied capture unless it duplicates a recent one"""
+        path, duplicate = self.save_deduplicated(img)
+        # The history and notifications belong on the main thread
+        cron.after("0ms", lambda: self.saved_copy(selection, path, duplicate))
+
+    def saved_copy(self, selection, path, duplicate):
+        """Record a saved copy in the screenshot history, or say why it
+        wasn't saved"""
+        if duplicate is None:
+            self.record_capture(selection)
+        elif path == duplicate:
+            actions.app.notify(self.save_message(path, duplicate))
+
     def screenshot_next(self):
         """Cycle to the next screenshot based off the previously used direction"""
         self.screenshot_cycle(self.cycle_direction)
@@ -733,45 +1400,41 @@ class ShotBox:
 
     def screenshot_select(self, idx):
         self.screenshot_history_idx = idx
-        self.set_selection(self.screenshot_history[self.screenshot_history_idx])
-        self.commit()
+        self.animate_to(self.screenshot_history[self.screenshot_history_idx])
 
     def undo(self):
         """Undo the last selection modification"""
+        self.animator.record_pending()
         if len(self.selection_history) == 0:
             return
-        self.set_selection(self.get_last_selection(1))
-        self.canvas.freeze()
+        self.animate_to(self.get_last_selection(1), record=False)
 
     def redo(self):
         """Redo the last selection modification"""
+        self.animator.record_pending()
         if self.selection_history_idx == len(self.selection_history):
             return
-        self.set_selection(self.get_last_selection(-1))
-        self.canvas.freeze()
+        self.animate_to(self.get_last_selection(-1), record=False)
 
-    def mouse_drag(self, modifiers=None):
+    def mouse_drag(self, modifiers="", button=-1):
         """Drag the mouse across the current selection"""
+        self.animator.finish()
         x, y, width, height = self.unclipped_selection()
-        start_x = x
-        start_y = y
-        end_x = x + width
-        end_y = y + height
         self.disable()
+        self.drag.start((x, y), (x + width, y + height), modifiers, button)
 
-        ctrl.mouse_move(
-            start_x,
-            start_y,
-        )
+    def activate(self):
+        """Show the shotbox overlay and enable the shotbox commands"""
+        if not self.canvas:
+            self.setup()
+        self.show()
+        self.enable()
 
-        ctrl.mouse_click(0, down=True)
-        # Let the underlying application react
-        actions.sleep(0.05)
-        ctrl.mouse_move(
-            end_x,
-            end_y,
-        )
-        ctrl.mouse_click(0, up=True)
+    def enable(self):
+        """Enable the shotbox commands"""
+        global ctx
+        ctx.tags = ["user.shotbox_showing"]
+        shotbox_mode_enable()
 
     def disable(self):
         """Disable the shotbox overlay"""
@@ -787,7 +1450,140 @@ def hex_to_string(v: int) -> str:
     return f"{v:x}"
 
 
+def trace_folder() -> pathlib.Path:
+    """Return the folder traces and their replay reports are kept in"""
+    return shotbox.cache_folder / "traces"
+
+
+def screenshot_path(folder: pathlib.Path) -> pathlib.Path:
+    """Return a new unique path for a capture in a folder"""
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+    millis = int(now * 1000) % 1000
+    return folder / f"shotbox-{stamp}-{millis:03d}.png"
+
+
+class StubCanvas:
+    """Stands in for the overlay canvas when nothing should be shown"""
+
+    def register(self, event, callback):
+        pass
+
+    def unregister(self, event, callback):
+        pass
+
+    def freeze(self):
+        pass
+
+    def show(self):
+        pass
+
+    def hide(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class HeadlessShotBox(ShotBox):
+    """A ShotBox that never shows an overlay, switches talon modes, or
+    touches the user's history and screenshots. Used for replaying traces.
+
+    Captures are blank images of the selection size, which are still written
+    to the cache folder so the bytes written stay comparable.
+    """
+
+    def create_canvas(self, selected_screen):
+        return StubCanvas()
+
+    def capture(self, rect=None):
+        if rect is None:
+            rect = self.unclipped_rect()
+        height = max(1, self.to_physical(rect.height))
+        width = max(1, self.to_physical(rect.width))
+        return array_to_image(np.zeros((height, width, 4), dtype=np.uint8))
+
+    def capture_folder(self):
+        return self.cache_folder / "captures"
+
+    def animation_duration(self):
+        # Replays run synchronously, so every jump has to land immediately
+        return 0
+
+    def touch(self):
+        # A throwaway box has nothing worth reclaiming
+        pass
+
+    def copy_to_clipboard(self, img):
+        pass
+
+    def find_duplicate(self, img):
+        # Blank captures would all be duplicates, skewing the bytes written
+        return None, None
+
+    def screenshot_rect(self, rect):
+        self.save_capture(self.capture(rect))
+
+    def save_in_background(self, img, selection):
+        # Saving synchronously keeps the replay's byte counts deterministic
+        path, duplicate = self.save_deduplicated(img)
+        self.saved_copy(selection, path, duplicate)
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        self.close()
+
+
 shotbox = ShotBox(debug=False)
+tracer = TraceRecorder()
+
+
+def _replay_activate_win(box, *pos):
+    box.activate()
+    box.select(pos)
+
+
+# How each traced action is replayed against a ShotBox. The traced arguments
+# are already resolved, so these don't consult the mouse, windows or settings.
+trace_dispatch = {
+    "shotbox_activate": lambda box: box.activate(),
+    "shotbox_activate_win": _replay_activate_win,
+    "shotbox_close": lambda box: box.disable(),
+    "shotbox_snap_mouse": lambda box, x, y: box.move_to(x, y),
+    "shotbox_grow": lambda box, direction, size: box.adjust(direction, size),
+    "shotbox_shrink": lambda box, direction, size: box.adjust(direction, -size),
+    "shotbox_move": lambda box, direction, count: box.move(direction, count),
+    "shotbox_screenshot": lambda box: box.screenshot(),
+    "shotbox_copy": lambda box: box.copy_screenshot(),
+    "shotbox_set_x": lambda box, x: box.set_x(x),
+    "shotbox_set_y": lambda box, y: box.set_y(y),
+    "shotbox_set_width": lambda box, width: box.set_width(width),
+    "shotbox_set_height": lambda box, height: box.set_height(height),
+    "shotbox_set_size": lambda box, width, height: box.set_size(width, height),
+    "shotbox_reset": lambda box, *pos: box.select(pos),
+    "shotbox_multiply": lambda box, numerator, denominator, dimension: box.multiply(
+        numerator, denominator, dimension
+    ),
+    "shotbox_undo": lambda box: box.undo(),
+    "shotbox_redo": lambda box: box.redo(),
+    "shotbox_loupe_toggle": lambda box: box.toggle_loupe(),
+    "shotbox_labels_toggle": lambda box: box.toggle_labels(),
+    "shotbox_set_edge": lambda box, direction, value: box.set_edge(direction, value),
+    "shotbox_loupe_zoom": lambda box, step: box.zoom_loupe(step),
+    "shotbox_screenshot_cycle": lambda box, direction: box.screenshot_cycle(direction),
+    "shotbox_screenshot_select": lambda box, idx: box.screenshot_select(idx),
+    "shotbox_snap_box": lambda box, *pos: box.select(pos),
+    "shotbox_annotate": lambda box, kind, *args: box.annotate(
+        annotation_kinds[kind](*args)
+    ),
+    "shotbox_annotation_remove": lambda box: box.remove_annotation(),
+    "shotbox_annotation_clear": lambda box: box.clear_annotations(),
+    "shotbox_redact": lambda box, *pos: box.redact(pos),
+    "shotbox_redaction_remove": lambda box: box.remove_redaction(),
+    "shotbox_redaction_clear": lambda box: box.clear_redactions(),
+}
 
 
 def shotbox_mode_enable():
@@ -802,6 +1598,12 @@ def shotbox_mode_disable():
     actions.mode.enable("command")
 
 
+def annotate(kind, *args):
+    """Add an annotation of a kind to the selection. See `annotation_kinds`"""
+    tracer.record("shotbox_annotate", kind, *args)
+    shotbox.annotate(annotation_kinds[kind](*args))
+
+
 @mod.capture(rule="{user.shotbox_snap_positions}")
 def shotbox_snap_position(m) -> RelativeScreenPos:
     return _snap_positions[m.shotbox_snap_positions]
@@ -811,144 +1613,297 @@ def shotbox_snap_position(m) -> RelativeScreenPos:
 class ShotBoxActions:
     def shotbox_activate():
         """Show the shotbox overlay on default screen"""
-        if not shotbox.canvas:
-            shotbox.setup()
-        shotbox.show()
-        ctx.tags = ["user.shotbox_showing"]
-        shotbox_mode_enable()
+        tracer.record("shotbox_activate")
+        shotbox.activate()
 
     def shotbox_activate_win():
         """Show the shotbox overlay on default screen, highlighting active window"""
-        actions.user.shotbox_activate()
+        shotbox.activate()
         win = ui.active_window()
-        shotbox.set_selection(shotbox.clip_rect(win.rect))
-        shotbox.commit()
+        rect = shotbox.clip_rect(win.rect)
+        selection = (rect.x, rect.y, rect.width, rect.height)
+        tracer.record("shotbox_activate_win", *selection)
+        shotbox.select(selection)
 
     def selection_shotbox_screen(screen_num: int):
         """Brings up overlay on the specified screen"""
         shotbox.setup(screen_num=screen_num)
         shotbox.show()
-        ctx.tags = ["user.shotbox_showing"]
-        shotbox_mode_enable()
+        shotbox.enable()
 
     def shotbox_close():
         """Close the active shotbox overlay"""
         if shotbox.active:
-            ctx.tags = []
-            shotbox.close()
-            shotbox_mode_disable()
+            tracer.record("shotbox_close")
+            shotbox.disable()
 
     def shotbox_snap_mouse():
         """Snap the current selection to the mouse cursor"""
-        shotbox.snap_mouse()
+        x, y = shotbox.get_mouse_coordinates()
+        tracer.record("shotbox_snap_mouse", x, y)
+        shotbox.move_to(x, y)
 
     def shotbox_grow(direction: str, size: int):
         """Increase the size of the selection from all angles"""
         if size == -1:
             size = setting_grow_size.get()
+        tracer.record("shotbox_grow", direction, size)
         shotbox.adjust(direction, size)
 
     def shotbox_shrink(direction: str, size: int):
         """Decrease the size of the selection from all angles"""
         if size == -1:
             size = setting_grow_size.get()
+        tracer.record("shotbox_shrink", direction, size)
         shotbox.adjust(direction, -size)
 
     def shotbox_move(direction: str, count: int):
         """Move the selection in some direction"""
         if count == -1:
             count = setting_grow_size.get()
+        tracer.record("shotbox_move", direction, count)
         shotbox.move(direction, count)
 
     def shotbox_screenshot():
         """Take a screenshot of the current selection"""
+        tracer.record("shotbox_screenshot")
         shotbox.screenshot()
 
+    def shotbox_copy():
+        """Copy a screenshot of the current selection to the clipboard"""
+        tracer.record("shotbox_copy")
+        shotbox.copy_screenshot()
+
     def shotbox_set_x(x: int):
         """Set the x coordinate of the current selection"""
+        tracer.record("shotbox_set_x", x)
         shotbox.set_x(x)
 
     def shotbox_set_y(y: int):
         """Set the y coordinate of the current selection"""
+        tracer.record("shotbox_set_y", y)
         shotbox.set_y(y)
 
     def shotbox_set_width(width: int):
         """Set the width of the current selection"""
+        tracer.record("shotbox_set_width", width)
         shotbox.set_width(width)
 
     def shotbox_set_height(height: int):
         """Set the height of the current selection"""
+        tracer.record("shotbox_set_height", height)
         shotbox.set_height(height)
 
     def shotbox_set_size(width: int, height: int):
         """Set the width and height of the current selection"""
+        tracer.record("shotbox_set_size", width, height)
         shotbox.set_size(width, height)
 
     def shotbox_reset():
         """Reset the selection to the default"""
-        shotbox.reset()
+        pos = shotbox.default_selection()
+        tracer.record("shotbox_reset", *pos)
+        shotbox.select(pos)
 
     def shotbox_grow_multiply(multiplier: str, direction: str):
         """Adjust the box by a multiplayer"""
-        multipliers = {"double": 2, "triple": 3, "half": 1.5}
-        m = multipliers[multiplier]
-        if direction == "width" or direction == "length":
-            shotbox.set_width(shotbox.width * m)
-        elif direction == "height":
-            shotbox.set_height(shotbox.height * m)
-        elif direction == "all":
-            shotbox.set_width(shotbox.width * m)
-            shotbox.set_height(shotbox.height * m)
+        numerator, denominator = geometry.GROW_MULTIPLIERS[multiplier]
+        tracer.record("shotbox_multiply", numerator, denominator, direction)
+        shotbox.multiply(numerator, denominator, direction)
 
     def shotbox_shrink_multiply(multiplier: str, direction: str):
         """Adjust the box by a multiplayer"""
-        multipliers = {"double": 0.5, "triple": 0.25, "half": 0.5}
-        m = multipliers[multiplier]
-        if direction == "width" or direction == "length":
-            shotbox.set_width(shotbox.width * m)
-        elif direction == "height":
-            shotbox.set_height(shotbox.height * m)
-        elif direction == "all":
-            shotbox.set_width(shotbox.width * m)
-            shotbox.set_height(shotbox.height * m)
+        numerator, denominator = geometry.SHRINK_MULTIPLIERS[multiplier]
+        tracer.record("shotbox_multiply", numerator, denominator, direction)
+        shotbox.multiply(numerator, denominator, direction)
 
     def shotbox_undo():
         """Undo the last selection modification"""
+        tracer.record("shotbox_undo")
         shotbox.undo()
 
     def shotbox_redo():
         """Redo the last selection modification"""
+        tracer.record("shotbox_redo")
         shotbox.redo()
 
-    def shotbox_mouse_drag():
-        """Drag the mouse over the current selection box"""
-        shotbox.mouse_drag()
+    def shotbox_loupe_toggle():
+        """Toggle the magnifier loupe next to the active edge"""
+        tracer.record("shotbox_loupe_toggle")
+        shotbox.toggle_loupe()
+
+    def shotbox_labels_toggle():
+        """Toggle the grid labels and selection size badge"""
+        tracer.record("shotbox_labels_toggle")
+        shotbox.toggle_labels()
+
+    def shotbox_set_edge(direction: str, value: int):
+        """Move the edges of the selection facing a direction to a coordinate"""
+        tracer.record("shotbox_set_edge", direction, value)
+        shotbox.set_edge(direction, value)
+
+    def shotbox_loupe_zoom(step: int):
+        """Zoom the magnifier loupe in or out by a number of levels"""
+        tracer.record("shotbox_loupe_zoom", step)
+        shotbox.zoom_loupe(step)
+
+    def shotbox_mouse_drag(modifiers: str = "", button: int = -1):
+        """Drag the mouse over the current selection box, holding any
+        modifiers for the duration of the drag"""
+        tracer.record("shotbox_mouse_drag", modifiers, button)
+        shotbox.mouse_drag(modifiers, button)
 
     def shotbox_screenshot_cycle_next():
         """Cycle to the next screenshot based off the previous direction"""
+        tracer.record("shotbox_screenshot_cycle", shotbox.cycle_direction)
         shotbox.screenshot_next()
 
     def shotbox_screenshot_cycle_older():
         """Cycle to the next oldest screenshot based off the previous direction"""
+        tracer.record("shotbox_screenshot_cycle", -1)
         shotbox.screenshot_cycle(-1)
 
     def shotbox_screenshot_cycle_newer():
         """Cycle to the next newer screenshot based off the previous direction"""
+        tracer.record("shotbox_screenshot_cycle", 1)
         shotbox.screenshot_cycle(1)
 
     def shotbox_screenshot_cycle_first():
         """Cycle to the first screenshot in the cache"""
+        tracer.record("shotbox_screenshot_select", 0)
         shotbox.screenshot_select(0)
 
     def shotbox_screenshot_cycle_last():
         """Cycle to the last screenshot in the cache"""
-        shotbox.screenshot_select(len(shotbox.screenshot_history) - 1)
+        idx = len(shotbox.screenshot_history) - 1
+        tracer.record("shotbox_screenshot_select", idx)
+        shotbox.screenshot_select(idx)
 
     def shotbox_snap_box(pos: RelativeScreenPos):
         """Snap the box to a position on the screen"""
         screen = ui.active_window().screen.visible_rect
         screen_height = screen.height
-        shotbox.set_x(screen.x + (screen.width * pos.left))
-        shotbox.set_y(screen.y + (screen_height * pos.top))
-        shotbox.set_width(screen.width * (pos.right - pos.left))
-        shotbox.set_height(screen_height * (pos.bottom - pos.top))
+        selection = (
+            screen.x + (screen.width * pos.left),
+            screen.y + (screen_height * pos.top),
+            screen.width * (pos.right - pos.left),
+            screen_height * (pos.bottom - pos.top),
+        )
+        tracer.record("shotbox_snap_box", *selection)
+        shotbox.select(selection)
+
+    def shotbox_annotate_arrow(direction: str):
+        """Add an arrow pointing at the mouse, coming from a direction"""
+        head_x, head_y = shotbox.get_mouse_coordinates()
+        step_x, step_y = geometry.MOVE_HALVES[direction]
+        dx = (step_x > 0) - (step_x < 0)
+        dy = (step_y > 0) - (step_y < 0)
+        # Shorten diagonals so all arrows are roughly the same length
+        length = 56 if dx and dy else 80
+        annotate("arrow", head_x + dx * length, head_y + dy * length, head_x, head_y)
+
+    def shotbox_annotate_box(pos: RelativeScreenPos):
+        """Outline part of the selection"""
+        rect = shotbox.relative_rect(pos)
+        annotate("box", rect.x, rect.y, rect.width, rect.height)
+
+    def shotbox_annotate_highlight(pos: RelativeScreenPos):
+        """Highlight part of the selection"""
+        rect = shotbox.relative_rect(pos)
+        annotate("highlight", rect.x, rect.y, rect.width, rect.height)
+
+    def shotbox_annotate_text(text: str):
+        """Add text at the mouse"""
+        x, y = shotbox.get_mouse_coordinates()
+        annotate("text", x, y, text)
+
+    def shotbox_annotation_remove():
+        """Remove the most recent annotation"""
+        tracer.record("shotbox_annotation_remove")
+        shotbox.remove_annotation()
+
+    def shotbox_annotation_clear():
+        """Remove all annotations"""
+        tracer.record("shotbox_annotation_clear")
+        shotbox.clear_annotations()
+
+    def shotbox_redact(pos: RelativeScreenPos):
+        """Hide part of the selection in captures"""
+        rect = shotbox.relative_rect(pos)
+        selection = (rect.x, rect.y, rect.width, rect.height)
+        tracer.record("shotbox_redact", *selection)
+        shotbox.redact(selection)
+
+    def shotbox_redact_box():
+        """Hide the current selection in captures, so the box can be moved on
+        to select the area to capture"""
+        selection = shotbox.selection()
+        tracer.record("shotbox_redact", *selection)
+        shotbox.redact(selection)
+
+    def shotbox_redaction_remove():
+        """Remove the most recent redaction"""
+        tracer.record("shotbox_redaction_remove")
+        shotbox.remove_redaction()
+
+    def shotbox_redaction_clear():
+        """Remove all redactions"""
+        tracer.record("shotbox_redaction_clear")
+        shotbox.clear_redactions()
+
+    def shotbox_memory_report():
+        """Show how much memory each shotbox cache is holding"""
+        usage = shotbox.memory_usage()
+        print(json.dumps(usage, indent=1))
+        actions.app.notify(", ".join(f"{name}: {size}" for name, size in usage.items()))
+
+    def shotbox_reclaim():
+        """Release shotbox caches now instead of waiting to be idle"""
+        if not shotbox.active:
+            shotbox.reclaim()
+
+    def shotbox_trace_start():
+        """Start recording a trace of shotbox actions"""
+        tracer.start()
+        actions.app.notify("Shotbox trace recording")
+
+    def shotbox_trace_stop(name: str = ""):
+        """Stop recording a trace and save it to the trace folder"""
+        if not tracer.recording():
+            return
+        if name == "":
+            name = time.strftime("%Y%m%d-%H%M%S")
+        path = trace_folder() / f"{name}.json"
+        save_trace(path, tracer.stop())
+        actions.app.notify(f"Shotbox trace saved to {path}")
+
+    def shotbox_trace_replay(name: str = "", headless: int = 1):
+        """Replay a recorded trace, by default the latest, and report how
+        long each action took. Headless replays use a throwaway ShotBox
+        without an overlay."""
+        traces = sorted(
+            (p for p in trace_folder().glob("*.json") if p.stem.count(".") == 0),
+            key=lambda p: p.stat().st_mtime,
+        )
+        if name != "":
+            traces = [p for p in traces if p.stem == name]
+        if len(traces) == 0:
+            actions.app.notify("No shotbox trace to replay")
+            return
+        path = traces[-1]
+        entries = load_trace(path)
+
+        if headless:
+            with tempfile.TemporaryDirectory() as folder:
+                box = HeadlessShotBox(cache_folder=pathlib.Path(folder))
+                box.setup()
+                report = replay_trace(box, entries, trace_dispatch)
+        else:
+            report = replay_trace(shotbox, entries, trace_dispatch)
+
+        save_trace(path.with_suffix(".report.json"), report)
+        print(json.dumps(report, indent=1))
+        actions.app.notify(
+            f"Replayed {report['replayed']} actions in {report['total_ms']}ms, "
+            f"{report['redraws']} redraws, {report['bytes_written']} bytes"
+        )
@@ -0,0 +1,119 @@
+import time
+
+from talon import Module, cron
+
+mod = Module()
+
+setting_animation_duration = mod.setting(
+    "shotbox_animation_duration",
+    type=int,
+    default=120,
+    desc="How long in milliseconds large selection jumps animate for. 0 disables",
+)
+
+setting_animation_fps = mod.setting(
+    "shotbox_animation_fps",
+    type=int,
+    default=60,
+    desc="The maximum frame rate of selection animations",
+)
+
+
+def ease_out(t):
+    """Cubic ease out, so the box starts fast and settles gently"""
+    return 1 - (1 - t) ** 3
+
+
+class SelectionAnimator:
+    """Animate the selection of a ShotBox towards a target from one timer.
+
+    Frames are computed from the time elapsed rather than counted, so a frame
+    that runs late simply lands further along the path, and frames are
+    skipped outright while the last redraw took longer than the frame budget.
+    The target only reaches the selection history once the animation ends.
+    Starting a new animation mid-flight retargets it from wherever the box
+    currently is instead of queueing another one, and the abandoned target is
+    never recorded, so a quick run of jumps leaves a single history entry.
+    """
+
+    def __init__(self, box):
+        self.box = box
+        self.job = None
+        self.start = None
+        self.target = None
+        self.record = False
+        self.began = 0
+        self.duration = 0
+        self.budget = 0
+        self.last_frame = 0
+        self.frame_cost = 0
+
+    def running(self):
+        return self.job is not None
+
+    def animate(self, target, record):
+        """Move the selection to target, recording it in the history at the
+        end if record is set"""
+        box = self.box
+        duration = box.animation_duration()
+        if duration <= 0 or not box.active:
+            self.finish()
+            box.set_selection(target)
+            self.settle(record)
+            return
+
+        self.start = (box.x, box.y, box.width, box.height)
+        self.target = target
+        self.record = record
+        self.began = time.perf_counter()
+        self.duration = duration
+        if self.job is None:
+            fps = max(1, setting_animation_fps.get())
+            self.budget = 1 / fps
+            self.frame_cost = 0
+            self.job = cron.interval(f"{max(1, 1000 // fps)}ms", self.frame)
+
+    def frame(self):
+        """Draw the selection where it should be by now"""
+        now = time.perf_counter()
+        t = (now - self.began) / self.duration
+        if t >= 1:
+            self.finish()
+            return
+        # Rendering is falling behind, so let it catch up
+        if self.frame_cost > self.budget and now - self.last_frame < self.frame_cost:
+            return
+
+        progress = ease_out(t)
+        self.box.set_selection(
+            tuple(
+                start + (end - start) * progress
+                for start, end in zip(self.start, self.target)
+            )
+        )
+        self.last_frame = now
+        self.box.redraw()
+        self.frame_cost = time.perf_counter() - now
+
+    def record_pending(self):
+        """Record the target of an in-flight animation in the history now,
+        so commands that read the history see it in the right order"""
+        if self.running() and self.record:
+            self.box.record_selection(tuple(self.target))
+            self.record = False
+
+    def finish(self):
+        """Jump straight to the end of an in-flight animation"""
+        if not self.running():
+            return
+        cron.cancel(self.job)
+        self.job = None
+        self.box.set_selection(self.target)
+        self.settle(self.record)
+
+    def settle(self, record):
+        """Draw the final selection, recording it if needed"""
+        if record:
+            self.box.commit()
+        elif self.box.active:
+            self.box.redraw()
@@ -0,0 +1,114 @@
+"""Annotations drawn over the selection and composited into captures.
+
+Annotation coordinates are in the same screen-relative space as the
+selection, so the same display list draws onto the overlay and, translated
+by the selection origin, onto a captured image.
+"""
+
+import math
+
+from talon.skia import Paint, Rect
+
+ARROW_HEAD_LENGTH = 16
+ARROW_HEAD_ANGLE = math.radians(30)
+STROKE_WIDTH = 3
+TEXT_SIZE = 24
+# Appended to the annotation color for highlights
+HIGHLIGHT_ALPHA = "55"
+
+
+class ArrowAnnotation:
+    """An arrow from a tail point to a head point"""
+
+    kind = "arrow"
+
+    def __init__(self, tail_x, tail_y, head_x, head_y):
+        self.tail_x = tail_x
+        self.tail_y = tail_y
+        self.head_x = head_x
+        self.head_y = head_y
+
+    def args(self):
+        return (self.tail_x, self.tail_y, self.head_x, self.head_y)
+
+    def draw(self, canvas, color):
+        canvas.paint.color = color
+        canvas.paint.style = Paint.Style.STROKE
+        canvas.paint.stroke_width = STROKE_WIDTH
+        canvas.draw_line(self.tail_x, self.tail_y, self.head_x, self.head_y)
+        angle = math.atan2(self.tail_y - self.head_y, self.tail_x - self.head_x)
+        for side in (-1, 1):
+            barb = angle + side * ARROW_HEAD_ANGLE
+            canvas.draw_line(
+                self.head_x,
+                self.head_y,
+                self.head_x + ARROW_HEAD_LENGTH * math.cos(barb),
+                self.head_y + ARROW_HEAD_LENGTH * math.sin(barb),
+            )
+
+
+class BoxAnnotation:
+    """An outlined rectangle"""
+
+    kind = "box"
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def args(self):
+        return (self.x, self.y, self.width, self.height)
+
+    def draw(self, canvas, color):
+        canvas.paint.color = color
+        canvas.paint.style = Paint.Style.STROKE
+        canvas.paint.stroke_width = STROKE_WIDTH
+        canvas.draw_rect(Rect(self.x, self.y, self.width, self.height))
+
+
+class HighlightAnnotation(BoxAnnotation):
+    """A translucent filled rectangle"""
+
+    kind = "highlight"
+
+    def draw(self, canvas, color):
+        canvas.paint.color = color + HIGHLIGHT_ALPHA
+        canvas.paint.style = Paint.Style.FILL
+        canvas.draw_rect(Rect(self.x, self.y, self.width, self.height))
+
+
+class TextAnnotation:
+    """A line of text with its baseline starting at a point"""
+
+    kind = "text"
+
+    def __init__(self, x, y, text):
+        self.x = x
+        self.y = y
+        self.text = text
+
+    def args(self):
+        return (self.x, self.y, self.text)
+
+    def draw(self, canvas, color):
+        canvas.paint.color = color
+        canvas.paint.style = Paint.Style.FILL
+        canvas.paint.textsize = TEXT_SIZE
+        canvas.draw_text(self.text, self.x, self.y)
+
+
+annotation_kinds = {
+    cls.kind: cls
+    for cls in (ArrowAnnotation, BoxAnnotation, HighlightAnnotation, TextAnnotation)
+}
+
+
+def draw_annotations(canvas, annotations, color):
+    """Draw a display list of annotations"""
+    canvas.paint.antialias = True
+    for annotation in annotations:
+        annotation.draw(canvas, color)
+    canvas.paint.style = Paint.Style.FILL
+    canvas.paint.stroke_width = 1
@@ -0,0 +1,137 @@
+"""Recognise captures that duplicate a recently saved one.
+
+Watch loops, retries and repeated screenshot commands tend to produce the
+same capture over and over. Every saved capture is recorded in a small
+on-disk index by its perceptual hash, so a new capture that hashes close
+enough to a recent one can be skipped, or hard linked to the existing file.
+At the default distance of 0 only byte-identical captures count. That is
+checked with an exact digest of the pixels, which is only computed for a
+new capture once its hash matches, and for saved captures as they're saved.
+"""
+
+import json
+import pathlib
+
+from talon import Module
+
+from .shotbox_image import average_hash, content_digest, hash_distance, image_to_array
+
+mod = Module()
+
+setting_dedupe_mode = mod.setting(
+    "shotbox_dedupe_mode",
+    type=str,
+    default="off",
+    desc="What to do with a capture that duplicates a recent one: skip, link or off. "
+    "When on, shotbox saves plain screenshots itself so they can be hashed",
+)
+
+setting_dedupe_distance = mod.setting(
+    "shotbox_dedupe_distance",
+    type=int,
+    default=0,
+    desc="How many hash bits a near duplicate may differ by. 0 means identical",
+)
+
+setting_dedupe_history = mod.setting(
+    "shotbox_dedupe_history",
+    type=int,
+    default=50,
+    desc="The number of recent captures checked for duplicates",
+)
+
+# How far apart the mean brightness of two duplicates may be
+LEVEL_TOLERANCE = 8
+
+
+class CaptureIndex:
+    """The hashes of recently saved captures, oldest first.
+
+    Entries look like `{"hash": "9f...", "level": 212, "digest": "3b...",
+    "width": 800, "height": 600, "path": "/home/me/Pictures/shotbox-....png"}`.
+    The index is loaded lazily, so it can be released whenever memory is
+    reclaimed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = None
+
+    def load(self):
+        """Load the index from disk if it isn't loaded already"""
+        if self.entries is not None:
+            return
+        self.entries = []
+        try:
+            with self.path.open() as f:
+                self.entries = json.load(f)
+        except Exception:
+            pass
+
+    def release(self):
+        """Drop the in-memory index. It is reloaded on next use"""
+        self.entries = None
+
+    def nbytes(self):
+        """Return the approximate memory used by the index"""
+        if self.entries is None:
+            return 0
+        return len(json.dumps(self.entries))
+
+    def hash(self, img):
+        """Return the hash and level of a capture, or None if deduplication
+        is off"""
+        if setting_dedupe_mode.get() == "off":
+            return None
+        return average_hash(image_to_array(img))
+
+    def find(self, digest, img):
+        """Return the path of a recent capture that the hashed image
+        duplicates, or None"""
+        if digest is None:
+            return None
+        self.load()
+        bits, level = digest
+        distance = setting_dedupe_distance.get()
+        content = None
+        # Newest first, since that's where duplicates usually are
+        for entry in reversed(self.entries):
+            if (
+                entry["width"] != img.width
+                or entry["height"] != img.height
+                or abs(entry["level"] - level) > LEVEL_TOLERANCE
+                or hash_distance(int(entry["hash"], 16), bits) > distance
+            ):
+                continue
+            if distance == 0:
+                if content is None:
+                    content = content_digest(image_to_array(img))
+                if entry.get("digest") != content:
+                    continue
+            path = pathlib.Path(entry["path"])
+            # The original may have been deleted since
+            if path.exists():
+                return path
+        return None
+
+    def add(self, digest, img, path):
+        """Record a saved capture, and write the index back to disk"""
+        if digest is None:
+            return 0
+        self.load()
+        bits, level = digest
+        self.entries.append(
+            {
+                "hash": f"{bits:x}",
+                "level": level,
+                "digest": content_digest(image_to_array(img)),
+                "width": img.width,
+                "height": img.height,
+                "path": str(path),
+            }
+        )
+        self.entries = self.entries[-max(1, setting_dedupe_history.get()) :]
+        encoded = json.dumps(self.entries)
+        with self.path.open("w+") as f:
+            f.write(encoded)
+        return len(encoded)
@@ -0,0 +1,125 @@
+import time
+
+from talon import Module, actions, cron, ctrl
+
+mod = Module()
+
+setting_drag_duration = mod.setting(
+    "shotbox_drag_duration",
+    type=int,
+    default=50,
+    desc="How long in milliseconds a drag takes to travel from start to end",
+)
+
+setting_drag_rate = mod.setting(
+    "shotbox_drag_rate",
+    type=int,
+    default=120,
+    desc="How many intermediate mouse moves per second a drag emits",
+)
+
+setting_drag_hold = mod.setting(
+    "shotbox_drag_hold",
+    type=int,
+    default=0,
+    desc="How long in milliseconds to hold the button before a drag starts moving",
+)
+
+setting_drag_easing = mod.setting(
+    "shotbox_drag_easing",
+    type=str,
+    default="linear",
+    desc="The easing curve of a drag. See `drag_easings`",
+)
+
+setting_drag_button = mod.setting(
+    "shotbox_drag_button",
+    type=int,
+    default=0,
+    desc="The mouse button used for dragging. 0 is left, 1 right and 2 middle",
+)
+
+drag_easings = {
+    "linear": lambda t: t,
+    "ease in": lambda t: t * t,
+    "ease out": lambda t: t * (2 - t),
+    "ease in out": lambda t: 3 * t * t - 2 * t * t * t,
+}
+
+
+class MouseDrag:
+    """Drag the mouse between two points along an interpolated path.
+
+    The path is stepped from a cron interval instead of blocking sleeps, so
+    talon stays responsive while the application under the mouse sees a
+    steady stream of motion events between the press and the release.
+    """
+
+    def __init__(self):
+        self.job = None
+        self.start_pos = None
+        self.end_pos = None
+        self.modifiers = []
+        self.button = 0
+        self.started = 0
+        self.duration = 0
+        self.easing = drag_easings["linear"]
+
+    def running(self):
+        return self.job is not None
+
+    def start(self, start_pos, end_pos, modifiers="", button=-1):
+        """Press at start_pos and start moving towards end_pos"""
+        if self.running():
+            self.finish()
+
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        self.modifiers = [m for m in modifiers.split("-") if m]
+        self.button = setting_drag_button.get() if button == -1 else button
+        self.duration = setting_drag_duration.get() / 1000
+        self.easing = drag_easings.get(
+            setting_drag_easing.get(), drag_easings["linear"]
+        )
+
+        if self.modifiers:
+            actions.key(" ".join(f"{m}:down" for m in self.modifiers))
+        ctrl.mouse_move(*self.start_pos)
+        ctrl.mouse_click(self.button, down=True)
+
+        # Motion starts once the hold has elapsed, which gives slow
+        # applications time to notice the press
+        self.started = time.perf_counter() + setting_drag_hold.get() / 1000
+        interval = max(1, 1000 // max(1, setting_drag_rate.get()))
+        self.job = cron.interval(f"{interval}ms", self.step)
+
+    def step(self):
+        """Move to wherever the path should be by now"""
+        elapsed = time.perf_counter() - self.started
+        if elapsed < 0:
+            return
+        if self.duration <= 0:
+            t = 1.0
+        else:
+            t = min(1.0, elapsed / self.duration)
+        progress = self.easing(t)
+
+        start_x, start_y = self.start_pos
+        end_x, end_y = self.end_pos
+        ctrl.mouse_move(
+            start_x + (end_x - start_x) * progress,
+            start_y + (end_y - start_y) * progress,
+        )
+        if t >= 1.0:
+            self.finish()
+
+    def finish(self):
+        """Jump to the end of the path and release everything"""
+        if not self.running():
+            return
+        cron.cancel(self.job)
+        self.job = None
+        ctrl.mouse_move(*self.end_pos)
+        ctrl.mouse_click(self.button, up=True)
+        if self.modifiers:
+            actions.key(" ".join(f"{m}:up" for m in reversed(self.modifiers)))
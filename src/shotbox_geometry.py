@@ -0,0 +1,183 @@
+"""Pure geometry for the shotbox selection.
+
+Selections are `Box` values in whole physical pixels. Direction names are
+resolved into edge tables once at import, so adjusting, moving and clamping
+a box is a couple of table lookups and integer arithmetic, without any
+string matching. Nothing here touches talon, so it can be exercised
+headlessly.
+"""
+
+from typing import NamedTuple
+
+
+class Box(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+# The smallest width and height a selection can shrink to
+MIN_SIZE = 1
+
+# Spoken direction names, and the arrow key names that alias them
+COMPASS = {
+    "north": "north",
+    "north east": "north east",
+    "east": "east",
+    "south east": "south east",
+    "south": "south",
+    "south west": "south west",
+    "west": "west",
+    "north west": "north west",
+    "up": "north",
+    "right": "east",
+    "down": "south",
+    "left": "west",
+    # No direction means every direction
+    "": "",
+}
+
+# How much each of the (left, top, right, bottom) edges moves per pixel of
+# growth in a direction
+_GROW = {
+    "north": (0, -1, 0, 0),
+    "north east": (0, -1, 1, 0),
+    "east": (0, 0, 1, 0),
+    "south east": (0, 0, 1, 1),
+    "south": (0, 0, 0, 1),
+    "south west": (-1, 0, 0, 1),
+    "west": (-1, 0, 0, 0),
+    "north west": (-1, -1, 0, 0),
+    "": (-1, -1, 1, 1),
+}
+
+_OPPOSITE = {
+    "north": "south",
+    "north east": "south west",
+    "east": "west",
+    "south east": "north west",
+    "south": "north",
+    "south west": "north east",
+    "west": "east",
+    "north west": "south east",
+    "": "",
+}
+
+# Movement per step in half pixels, so diagonals move half a step along
+# each axis
+_MOVE_HALVES = {
+    "north": (0, -2),
+    "north east": (1, -1),
+    "east": (2, 0),
+    "south east": (1, 1),
+    "south": (0, 2),
+    "south west": (-1, 1),
+    "west": (-2, 0),
+    "north west": (-1, -1),
+    "": (0, 0),
+}
+
+GROW_EDGES = {name: _GROW[compass] for name, compass in COMPASS.items()}
+# Shrinking in a direction pulls in the opposite edge, because shrinking
+# "up" should keep the top edge where it is. Sizes are negative when
+# shrinking, so the opposite edge's grow deltas move it inwards.
+SHRINK_EDGES = {name: _GROW[_OPPOSITE[compass]] for name, compass in COMPASS.items()}
+# Indexed by whether the size is negative
+EDGE_DELTAS = (GROW_EDGES, SHRINK_EDGES)
+# Which edges face a direction
+EDGE_MASKS = {
+    name: tuple(abs(delta) for delta in deltas) for name, deltas in GROW_EDGES.items()
+}
+MOVE_HALVES = {name: _MOVE_HALVES[compass] for name, compass in COMPASS.items()}
+OPPOSITE = {name: _OPPOSITE[compass] for name, compass in COMPASS.items()}
+
+# Which of (width, height) a dimension name scales
+DIMENSIONS = {
+    "width": (1, 0),
+    "length": (1, 0),
+    "height": (0, 1),
+    "all": (1, 1),
+}
+
+# Spoken multipliers as (numerator, denominator) fractions
+GROW_MULTIPLIERS = {"double": (2, 1), "triple": (3, 1), "half": (3, 2)}
+SHRINK_MULTIPLIERS = {"double": (1, 2), "triple": (1, 3), "half": (1, 2)}
+
+
+def from_edges(left, top, right, bottom):
+    """Build a box from its edges"""
+    return Box(left, top, right - left, bottom - top)
+
+
+def halve(v):
+    """Halve an integer, rounding towards zero"""
+    return (v + (v < 0)) // 2
+
+
+def adjust(box, direction, size):
+    """Grow a box in a direction by size pixels, or shrink it for negative
+    sizes"""
+    left, top, right, bottom = EDGE_DELTAS[size < 0][direction]
+    return from_edges(
+        box.x + left * size,
+        box.y + top * size,
+        box.x + box.width + right * size,
+        box.y + box.height + bottom * size,
+    )
+
+
+def move(box, direction, count):
+    """Move a box count pixels in a direction"""
+    dx, dy = MOVE_HALVES[direction]
+    return Box(
+        box.x + halve(dx * count), box.y + halve(dy * count), box.width, box.height
+    )
+
+
+def move_edges(box, direction, value):
+    """Move the edges facing a direction to a coordinate"""
+    left, top, right, bottom = EDGE_MASKS[direction]
+    box_right = box.x + box.width
+    box_bottom = box.y + box.height
+    return from_edges(
+        box.x + left * (value - box.x),
+        box.y + top * (value - box.y),
+        box_right + right * (value - box_right),
+        box_bottom + bottom * (value - box_bottom),
+    )
+
+
+def multiply(box, numerator, denominator, dimension):
+    """Scale the width and/or height of a box by a fraction"""
+    scale_width, scale_height = DIMENSIONS[dimension]
+    width = box.width * numerator // denominator
+    height = box.height * numerator // denominator
+    return Box(
+        box.x,
+        box.y,
+        box.width + scale_width * (width - box.width),
+        box.height + scale_height * (height - box.height),
+    )
+
+
+def clip(box, bounds):
+    """Clip a box to lie within bounds, keeping it at least MIN_SIZE wide and
+    tall. Edges past the bounds are pulled in"""
+    max_right = bounds.x + bounds.width
+    max_bottom = bounds.y + bounds.height
+    x = min(max(box.x, bounds.x), max_right - MIN_SIZE)
+    y = min(max(box.y, bounds.y), max_bottom - MIN_SIZE)
+    right = min(max(box.x + box.width, x + MIN_SIZE), max_right)
+    bottom = min(max(box.y + box.height, y + MIN_SIZE), max_bottom)
+    return from_edges(x, y, right, bottom)
+
+
+def contain(box, bounds):
+    """Slide a box back within bounds without changing its size, unless it
+    is larger than the bounds"""
+    width = min(max(box.width, MIN_SIZE), bounds.width)
+    height = min(max(box.height, MIN_SIZE), bounds.height)
+    x = min(max(box.x, bounds.x), bounds.x + bounds.width - width)
+    y = min(max(box.y, bounds.y), bounds.y + bounds.height - height)
+    return Box(x, y, width, height)
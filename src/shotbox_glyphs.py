@@ -0,0 +1,77 @@
+"""A pre-rasterized glyph atlas for overlay labels.
+
+Grid labels and the selection badge only ever need digits and a few
+separators, and they are redrawn on every overlay frame. Shaping text for
+each of them would cost far more than the grid lines they label, so the
+glyphs are drawn once into an image and labels are drawn as blits out of it.
+"""
+
+import math
+
+from talon.skia import Rect, Surface
+
+GLYPHS = "0123456789-.,@× "
+
+
+class GlyphAtlas:
+    """Fixed-width cells of pre-rendered glyphs in a single image"""
+
+    def __init__(self):
+        self.image = None
+        self.key = None
+        self.cells = {}
+        self.cell_width = 0
+        self.cell_height = 0
+
+    def ensure(self, color, textsize, scale=1):
+        """Make sure the atlas is rendered for a color, size and pixel scale"""
+        key = (color, textsize, scale)
+        if key == self.key:
+            return
+        self.key = key
+
+        self.cell_width = math.ceil(textsize * 0.65)
+        self.cell_height = math.ceil(textsize * 1.25)
+        # Rendered at physical resolution so labels stay sharp on HiDPI
+        physical_width = math.ceil(self.cell_width * scale)
+        physical_height = math.ceil(self.cell_height * scale)
+        surface = Surface(physical_width * len(GLYPHS), physical_height)
+        canvas = surface.canvas()
+        canvas.paint.antialias = True
+        canvas.paint.color = color
+        canvas.paint.textsize = textsize * scale
+        for i, glyph in enumerate(GLYPHS):
+            canvas.draw_text(glyph, i * physical_width, textsize * scale)
+        self.image = surface.snapshot()
+        self.cells = {
+            glyph: Rect(i * physical_width, 0, physical_width, physical_height)
+            for i, glyph in enumerate(GLYPHS)
+        }
+
+    def release(self):
+        """Drop the rendered atlas. It is rebuilt on the next ensure()"""
+        self.image = None
+        self.key = None
+        self.cells = {}
+
+    def nbytes(self):
+        """Return the approximate memory used by the atlas image"""
+        if self.image is None:
+            return 0
+        return self.image.width * self.image.height * 4
+
+    def measure(self, text):
+        """Return the width and height of a label"""
+        return (len(text) * self.cell_width, self.cell_height)
+
+    def draw(self, canvas, text, x, y):
+        """Draw a label with its top left corner at x, y"""
+        for i, glyph in enumerate(text):
+            source = self.cells.get(glyph)
+            if source is None:
+                continue
+            canvas.draw_image_rect(
+                self.image,
+                source,
+                Rect(x + i * self.cell_width, y, self.cell_width, self.cell_height),
+            )
@@ -0,0 +1,266 @@
+"""In-memory image helpers for shotbox captures.
+
+These operate on the numpy view of a captured `talon.skia.Image`, so nothing
+here needs to touch the disk or the screen.
+"""
+
+import hashlib
+import math
+
+import numpy as np
+from talon.skia import Image
+
+# Side length of the block grid used to fingerprint a region
+SIGNATURE_BLOCKS = 16
+# How many sampled pixels per block (per axis) we average over
+SIGNATURE_SAMPLES = 4
+# The most pixels box_blur blurs at full resolution
+BLUR_PIXELS = 1 << 19
+# Side length of the block grid hashed to recognise duplicate captures
+HASH_BLOCKS = 16
+# The most rows average_hash reads before it samples every few rows
+HASH_ROWS = 1024
+# The most rows of bytes that can be summed in a uint16
+BAND_ROWS = 257
+
+
+def image_to_array(img: Image) -> np.ndarray:
+    """Return the (height, width, channels) pixel array backing an image"""
+    return np.asarray(img)
+
+
+def array_to_image(arr: np.ndarray) -> Image:
+    """Wrap a (height, width, 4) pixel array back into an image"""
+    return Image.from_array(np.ascontiguousarray(arr))
+
+
+def block_signature(arr: np.ndarray, blocks: int = SIGNATURE_BLOCKS) -> np.ndarray:
+    """Downsample an image into a grid of mean intensities.
+
+    Only a sparse lattice of pixels is read, so the cost depends on the grid
+    size rather than on the size of the selection.
+    """
+    height, width = arr.shape[:2]
+    blocks_y = max(1, min(blocks, height))
+    blocks_x = max(1, min(blocks, width))
+    step_y = max(1, height // (blocks_y * SIGNATURE_SAMPLES))
+    step_x = max(1, width // (blocks_x * SIGNATURE_SAMPLES))
+
+    sample = arr[::step_y, ::step_x, :3].sum(axis=2, dtype=np.uint32)
+    rows = (np.arange(blocks_y) * sample.shape[0]) // blocks_y
+    cols = (np.arange(blocks_x) * sample.shape[1]) // blocks_x
+    sums = np.add.reduceat(np.add.reduceat(sample, rows, axis=0), cols, axis=1)
+    counts = np.outer(
+        np.diff(rows, append=sample.shape[0]), np.diff(cols, append=sample.shape[1])
+    )
+    return (sums // (counts * 3)).astype(np.uint8)
+
+
+def signature_delta(a: np.ndarray, b: np.ndarray, tolerance: int = 8) -> float:
+    """Return the fraction of blocks that differ by more than the tolerance"""
+    if a.shape != b.shape:
+        return 1.0
+    changed = np.abs(a.astype(np.int16) - b.astype(np.int16)) > tolerance
+    return np.count_nonzero(changed) / changed.size
+
+
+def area_means(arr: np.ndarray, blocks: int) -> np.ndarray:
+    """Downsample an image into a grid of mean intensities.
+
+    Unlike block_signature every column is read, so a change anywhere along
+    a row moves the mean of its block. Rows are summed a band at a time in
+    16 bits, which is twice as fast as 32, so bands taller than a uint16 can
+    hold are sampled every few rows.
+    """
+    height = arr.shape[0]
+    blocks_y = max(1, min(blocks, height))
+    arr = arr[:: max(1, -(-height // (blocks_y * BAND_ROWS)))]
+    height, width, channels = arr.shape
+    blocks_x = max(1, min(blocks, width))
+    rows = np.append((np.arange(blocks_y) * height) // blocks_y, height)
+    cols = (np.arange(blocks_x) * width) // blocks_x
+
+    flat = arr.reshape(height, width * channels)
+    bands = np.empty((blocks_y, width * channels), dtype=np.uint16)
+    for i in range(blocks_y):
+        np.add.reduce(
+            flat[rows[i] : rows[i + 1]], axis=0, dtype=np.uint16, out=bands[i]
+        )
+    sums = np.add.reduceat(
+        bands.reshape(blocks_y, width, channels), cols, axis=1, dtype=np.uint64
+    )
+    counts = np.outer(np.diff(rows), np.diff(cols, append=width))
+    return sums[..., :3].sum(axis=2) / (counts * 3)
+
+
+def average_hash(arr: np.ndarray, blocks: int = HASH_BLOCKS):
+    """Return a perceptual hash of an image as (bits, level).
+
+    Each bit is set where a block of the area averaged image is brighter than
+    the mean of the whole image, and the level is that mean. The bits alone
+    can't tell uniform images apart, so the level is compared separately.
+    Images taller than HASH_ROWS are hashed from every few rows, which keeps
+    this to a few milliseconds at 4K.
+    """
+    means = area_means(arr[:: max(1, arr.shape[0] // HASH_ROWS)], blocks)
+    level = means.mean()
+    bits = np.packbits(means > level)
+    return int.from_bytes(bits.tobytes(), "big"), int(level)
+
+
+def content_digest(arr: np.ndarray) -> str:
+    """Return a digest of the exact pixels of an image.
+
+    This reads every byte, so it's only worth computing for captures whose
+    average_hash already matches.
+    """
+    return hashlib.sha1(np.ascontiguousarray(arr)).hexdigest()
+
+
+def hash_distance(a: int, b: int) -> int:
+    """Return the number of bits that differ between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def clip_region(arr: np.ndarray, x: int, y: int, width: int, height: int):
+    """Clip a region to the bounds of an image, returning its slices"""
+    height_max, width_max = arr.shape[:2]
+    x0 = min(max(0, x), width_max)
+    y0 = min(max(0, y), height_max)
+    x1 = min(max(0, x + width), width_max)
+    y1 = min(max(0, y + height), height_max)
+    return slice(y0, y1), slice(x0, x1)
+
+
+def _average_blocks(region: np.ndarray, block: int):
+    """Replace a region in place with block averages, allowing ragged blocks
+    at the edges"""
+    h, w = region.shape[:2]
+    if h == 0 or w == 0:
+        return
+    row_starts = np.arange(0, h, block)
+    col_starts = np.arange(0, w, block)
+    row_sizes = np.diff(row_starts, append=h)
+    col_sizes = np.diff(col_starts, append=w)
+    sums = np.add.reduceat(
+        np.add.reduceat(region, row_starts, axis=0, dtype=np.uint32),
+        col_starts,
+        axis=1,
+    )
+    means = sums // np.outer(row_sizes, col_sizes)[..., None]
+    region[:] = np.repeat(np.repeat(means, row_sizes, axis=0), col_sizes, axis=1)
+
+
+def pixelate(arr: np.ndarray, x: int, y: int, width: int, height: int, block: int):
+    """Replace a region of an image in place with block averages"""
+    rows, cols = clip_region(arr, x, y, width, height)
+    region = arr[rows, cols]
+    h, w, channels = region.shape
+    if h == 0 or w == 0:
+        return
+
+    # Whole blocks are a free reshape of the region, and summing rows before
+    # columns keeps both reductions running over contiguous memory. Only the
+    # ragged edges need the slower path.
+    inner_h = h - h % block
+    inner_w = w - w % block
+    if inner_h and inner_w:
+        inner = region[:inner_h, :inner_w]
+        row_sums = inner.reshape(inner_h // block, block, inner_w * channels).sum(
+            axis=1, dtype=np.uint32
+        )
+        sums = row_sums.reshape(inner_h // block, inner_w // block, block, channels)
+        means = (sums.sum(axis=2) // (block * block)).astype(arr.dtype)
+        inner.reshape(inner_h // block, block, inner_w, channels)[:] = np.repeat(
+            means, block, axis=1
+        )[:, None]
+    _average_blocks(region[inner_h:], block)
+    _average_blocks(region[:inner_h, inner_w:], block)
+
+
+def _downsample(region: np.ndarray, step: int) -> np.ndarray:
+    """Return the means of step by step blocks of a region, padding the
+    ragged edges by repeating the last row and column"""
+    if step == 1:
+        return region
+    h, w, channels = region.shape
+    if h % step or w % step:
+        region = np.pad(region, ((0, -h % step), (0, -w % step), (0, 0)), "edge")
+        h, w = region.shape[:2]
+    # Adding strided slices a row or column of each block at a time is much
+    # cheaper than reducing over a middle axis
+    rows = region[0::step].astype(np.uint32)
+    for dy in range(1, step):
+        rows += region[dy::step]
+    blocks = rows.reshape(h // step, w // step, step, channels)
+    sums = blocks[:, :, 0].copy()
+    for dx in range(1, step):
+        sums += blocks[:, :, dx]
+    return (sums // (step * step)).astype(region.dtype)
+
+
+def _upsample(small: np.ndarray, step: int, region: np.ndarray):
+    """Fill a region with step by step blocks of a downsampled image"""
+    if step == 1:
+        region[:] = small
+        return
+    rows = np.repeat(small, step, axis=1)[:, : region.shape[1]]
+    for dy in range(step):
+        target = region[dy::step]
+        target[:] = rows[: target.shape[0]]
+
+
+def _window_sums(values: np.ndarray, radius: int, axis: int):
+    """Sum each element with its neighbours along an axis, using a prefix
+    sum so the cost doesn't depend on the radius. Returns the sums and the
+    window sizes, which shrink at the edges.
+
+    The prefix sum is padded with radius copies of its first and last values,
+    so every window is the difference of two plain slices.
+    """
+    n = values.shape[axis]
+    values = np.moveaxis(values, axis, 0)
+    table = np.empty((n + 2 * radius + 1, *values.shape[1:]), dtype=np.int32)
+    table[: radius + 1] = 0
+    if axis == 0:
+        # np.cumsum down the first axis is many times slower than adding one
+        # contiguous row at a time
+        for i in range(n):
+            np.add(table[radius + i], values[i], out=table[radius + i + 1])
+    else:
+        np.cumsum(
+            values, axis=0, dtype=np.int32, out=table[radius + 1 : radius + 1 + n]
+        )
+    table[radius + 1 + n :] = table[radius + n]
+    sums = table[2 * radius + 1 :] - table[:n]
+
+    idx = np.arange(n)
+    counts = np.minimum(idx + radius + 1, n) - np.maximum(idx - radius, 0)
+    return np.moveaxis(sums, 0, axis), counts
+
+
+def box_blur(arr: np.ndarray, x: int, y: int, width: int, height: int, radius: int):
+    """Box blur a region of an image in place.
+
+    A box filter is separable, so this is a summed-area table factored into
+    a vertical and a horizontal prefix sum pass. Large regions and radii are
+    blurred on a downsample of at most BLUR_PIXELS pixels, which is scaled
+    back up afterwards. At redaction strengths that looks the same, and keeps
+    a full 4K region to around a hundred milliseconds. That is still slower
+    than pixelating, which is why pixelate is the default redaction style.
+    """
+    rows, cols = clip_region(arr, x, y, width, height)
+    region = arr[rows, cols]
+    h, w = region.shape[:2]
+    if h == 0 or w == 0:
+        return
+    step = max(1, radius // 4, math.ceil(math.sqrt(h * w / BLUR_PIXELS)))
+    small = _downsample(region, step)
+    radius = max(1, radius // step)
+    sums, row_counts = _window_sums(small, radius, 0)
+    sums, col_counts = _window_sums(sums, radius, 1)
+    # Multiplying by reciprocals is much cheaper than integer division
+    scale = (1 / np.outer(row_counts, col_counts)).astype(np.float32)[..., None]
+    blurred = sums.astype(np.float32)
+    blurred *= scale
+    _upsample(blurred.astype(arr.dtype), step, region)
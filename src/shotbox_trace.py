@@ -0,0 +1,99 @@
+"""Record shotbox sessions as traces of action calls, and replay them.
+
+A trace is a list of entries like `{"t": 1.25, "action": "shotbox_move",
+"args": ["left", 5]}`, where `t` is seconds since recording started and the
+arguments are already resolved (defaults filled in, mouse and window
+positions turned into coordinates), so a replay does not depend on where the
+mouse or the windows happen to be.
+"""
+
+import json
+import time
+
+
+class TraceRecorder:
+    """Collect timestamped action calls while recording"""
+
+    def __init__(self):
+        self.entries = None
+        self.started = 0
+
+    def recording(self):
+        return self.entries is not None
+
+    def start(self):
+        """Start a new trace, discarding any unfinished one"""
+        self.entries = []
+        self.started = time.perf_counter()
+
+    def record(self, action, *args):
+        """Record an action call if a trace is being recorded"""
+        if self.entries is None:
+            return
+        self.entries.append(
+            {
+                "t": round(time.perf_counter() - self.started, 4),
+                "action": action,
+                "args": list(args),
+            }
+        )
+
+    def stop(self):
+        """Stop recording and return the recorded entries"""
+        entries = self.entries or []
+        self.entries = None
+        return entries
+
+
+def load_trace(path):
+    """Load the entries of a trace file"""
+    with path.open() as f:
+        return json.load(f)
+
+
+def save_trace(path, entries):
+    """Write trace entries to a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w+") as f:
+        json.dump(entries, f, indent=1)
+
+
+def replay_trace(box, entries, dispatch):
+    """Replay trace entries against a ShotBox as fast as possible.
+
+    `dispatch` maps action names to `fn(box, *args)`. Actions without an
+    entry, like ones that move the real mouse, are skipped. Returns a report
+    of per-action and end-to-end latency, redraws and bytes written.
+    """
+    timings = {}
+    skipped = 0
+    redraws = box.redraw_count
+    bytes_written = box.bytes_written
+
+    begin = time.perf_counter()
+    for entry in entries:
+        fn = dispatch.get(entry["action"])
+        if fn is None:
+            skipped += 1
+            continue
+        start = time.perf_counter()
+        fn(box, *entry["args"])
+        timings.setdefault(entry["action"], []).append(time.perf_counter() - start)
+    total = time.perf_counter() - begin
+
+    return {
+        "actions": {
+            action: {
+                "count": len(samples),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "max_ms": round(max(samples) * 1000, 3),
+                "total_ms": round(sum(samples) * 1000, 3),
+            }
+            for action, samples in sorted(timings.items())
+        },
+        "total_ms": round(total * 1000, 3),
+        "replayed": len(entries) - skipped,
+        "skipped": skipped,
+        "redraws": box.redraw_count - redraws,
+        "bytes_written": box.bytes_written - bytes_written,
+    }
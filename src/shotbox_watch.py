@@ -0,0 +1,112 @@
+from talon import Module, actions, cron
+
+from .shotbox import shotbox
+from .shotbox_image import block_signature, image_to_array, signature_delta
+
+mod = Module()
+
+setting_watch_interval = mod.setting(
+    "shotbox_watch_interval",
+    type=int,
+    default=250,
+    desc="How often in milliseconds a watched region is sampled",
+)
+
+setting_watch_threshold = mod.setting(
+    "shotbox_watch_threshold",
+    type=float,
+    default=0.02,
+    desc="The fraction of the watched region that must change to trigger a capture",
+)
+
+setting_watch_max_captures = mod.setting(
+    "shotbox_watch_max_captures",
+    type=int,
+    default=100,
+    desc="The number of captures after which watching stops automatically",
+)
+
+
+class RegionWatcher:
+    """Sample a selection on a timer and capture it whenever it changes.
+
+    Each sample is reduced to a small block signature, which is compared to
+    the signature of the last capture. Comparing against the last capture
+    rather than the last sample means slow changes, like a progress bar
+    creeping along, still add up to a capture eventually.
+    """
+
+    def __init__(self, shotbox):
+        self.shotbox = shotbox
+        self.job = None
+        self.rect = None
+        self.selection = None
+        self.signature = None
+        self.captures = 0
+
+    def running(self):
+        return self.job is not None
+
+    def start(self):
+        """Start watching the current selection"""
+        if self.running():
+            self.stop()
+        box = self.shotbox
+        self.selection = box.selection()
+        self.rect = box.unclipped_rect()
+        self.signature = None
+        self.captures = 0
+        # The overlay would otherwise be part of every sample
+        box.disable()
+        interval = max(1, setting_watch_interval.get())
+        self.job = cron.interval(f"{interval}ms", self.sample)
+
+    def stop(self):
+        """Stop watching"""
+        if not self.running():
+            return
+        cron.cancel(self.job)
+        self.job = None
+        actions.app.notify(f"Shotbox watch stopped after {self.captures} captures")
+
+    def sample(self):
+        """Sample the watched region and capture it if it changed enough"""
+        # Showing the overlay changes the region, so start over afterwards
+        if self.shotbox.active:
+            self.signature = None
+            return
+
+        img = self.shotbox.capture(self.rect)
+        signature = block_signature(image_to_array(img))
+        if self.signature is None:
+            self.signature = signature
+            return
+        if signature_delta(self.signature, signature) < setting_watch_threshold.get():
+            return
+
+        self.signature = signature
+        # The sample is already the capture, so there's no need for another grab
+        img = self.shotbox.process_capture(img, self.selection)
+        digest, duplicate = self.shotbox.find_duplicate(img)
+        self.shotbox.save_capture(img, digest, duplicate)
+        # Flipping back to something already captured isn't a new capture
+        if duplicate is not None:
+            return
+        self.shotbox.record_screenshot(self.selection)
+        self.captures += 1
+        if self.captures >= max(1, setting_watch_max_captures.get()):
+            self.stop()
+
+
+watcher = RegionWatcher(shotbox)
+
+
+@mod.action_class
+class ShotBoxWatchActions:
+    def shotbox_watch_start():
+        """Capture the current selection every time its contents change"""
+        watcher.start()
+
+    def shotbox_watch_stop():
+        """Stop watching the selection for changes"""
+        watcher.stop()
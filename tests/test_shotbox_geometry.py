@@ -0,0 +1,177 @@
+"""Property tests for the pure selection geometry kernel.
+
+shotbox_geometry imports nothing from talon, so it is tested directly from
+src without a talon install. Every direction is checked against a grid of
+boxes that includes ones hanging off and larger than the bounds.
+"""
+
+import itertools
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+import shotbox_geometry as geometry  # noqa: E402
+
+BOUNDS = geometry.Box(0, 0, 40, 30)
+DIRECTIONS = list(geometry.COMPASS)
+SIZES = range(-12, 13)
+
+# Boxes around, inside and beyond the bounds, including degenerate ones
+BOXES = [
+    geometry.Box(x, y, width, height)
+    for x, y, width, height in itertools.product(
+        (-10, 0, 7, 39, 45), (-10, 0, 5, 29, 35), (-5, 0, 1, 12, 60), (-5, 1, 9, 50)
+    )
+]
+# Boxes that are already valid selections
+CLIPPED = sorted(set(geometry.clip(box, BOUNDS) for box in BOXES))
+
+
+def old_adjust(box, direction, size):
+    """The string matching adjust() that the kernel replaced"""
+    x, y, width, height = box
+    if direction == "":
+        return (x - size, y - size, width + size * 2, height + size * 2)
+    if direction.startswith("north") or direction == "up":
+        if size < 0:
+            height = height + size
+        else:
+            y = y - size
+            height = height + size
+    if direction.startswith("south") or direction == "down":
+        if size < 0:
+            y = y - size
+            height = height + size
+        else:
+            height = height + size
+    if "east" in direction or direction == "right":
+        if size < 0:
+            x = x - size
+            width = width + size
+        else:
+            width = width + size
+    if "west" in direction or direction == "left":
+        if size < 0:
+            width = width + size
+        else:
+            x = x - size
+            width = width + size
+    return (x, y, width, height)
+
+
+def in_bounds(box, bounds):
+    return (
+        box.width >= geometry.MIN_SIZE
+        and box.height >= geometry.MIN_SIZE
+        and box.x >= bounds.x
+        and box.y >= bounds.y
+        and box.x + box.width <= bounds.x + bounds.width
+        and box.y + box.height <= bounds.y + bounds.height
+    )
+
+
+def test_tables_cover_every_direction():
+    for table in (
+        geometry.GROW_EDGES,
+        geometry.SHRINK_EDGES,
+        geometry.EDGE_MASKS,
+        geometry.MOVE_HALVES,
+        geometry.OPPOSITE,
+    ):
+        assert set(table) == set(DIRECTIONS)
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_clip_stays_in_bounds(box):
+    assert in_bounds(geometry.clip(box, BOUNDS), BOUNDS)
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_clip_is_idempotent(box):
+    clipped = geometry.clip(box, BOUNDS)
+    assert geometry.clip(clipped, BOUNDS) == clipped
+
+
+@pytest.mark.parametrize("box", CLIPPED)
+def test_clip_keeps_valid_boxes(box):
+    assert geometry.clip(box, BOUNDS) == box
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_contain_stays_in_bounds(box):
+    assert in_bounds(geometry.contain(box, BOUNDS), BOUNDS)
+
+
+@pytest.mark.parametrize("box", CLIPPED)
+def test_contain_keeps_size(box):
+    contained = geometry.contain(box, BOUNDS)
+    assert (contained.width, contained.height) == (box.width, box.height)
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_move_round_trips(direction):
+    for box, count in itertools.product(BOXES, SIZES):
+        moved = geometry.move(box, direction, count)
+        assert (moved.width, moved.height) == (box.width, box.height)
+        assert geometry.move(moved, direction, -count) == box
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_move_opposite_round_trips(direction):
+    opposite = geometry.OPPOSITE[direction]
+    for box, count in itertools.product(BOXES, SIZES):
+        moved = geometry.move(box, direction, count)
+        assert geometry.move(moved, opposite, count) == box
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_grow_then_opposite_shrink_is_identity(direction):
+    opposite = geometry.OPPOSITE[direction]
+    for box, size in itertools.product(BOXES, range(0, 13)):
+        grown = geometry.adjust(box, direction, size)
+        assert geometry.adjust(grown, opposite, -size) == box
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_adjust_matches_string_matching(direction):
+    for box, size in itertools.product(BOXES, SIZES):
+        assert tuple(geometry.adjust(box, direction, size)) == old_adjust(
+            box, direction, size
+        )
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_adjust_then_clip_stays_in_bounds(direction):
+    for box, size in itertools.product(CLIPPED, SIZES):
+        adjusted = geometry.adjust(box, direction, size)
+        assert in_bounds(geometry.clip(adjusted, BOUNDS), BOUNDS)
+
+
+@pytest.mark.parametrize("direction", DIRECTIONS)
+def test_move_edges_only_moves_facing_edges(direction):
+    left, top, right, bottom = geometry.EDGE_MASKS[direction]
+    for box, value in itertools.product(CLIPPED, range(0, 40, 7)):
+        moved = geometry.move_edges(box, direction, value)
+        edges = (moved.x, moved.y, moved.x + moved.width, moved.y + moved.height)
+        old = (box.x, box.y, box.x + box.width, box.y + box.height)
+        for mask, edge, before in zip((left, top, right, bottom), edges, old):
+            assert edge == (value if mask else before)
+
+
+@pytest.mark.parametrize("dimension", list(geometry.DIMENSIONS))
+def test_multiply_scales_only_the_dimension(dimension):
+    scale_width, scale_height = geometry.DIMENSIONS[dimension]
+    multipliers = [
+        *geometry.GROW_MULTIPLIERS.values(),
+        *geometry.SHRINK_MULTIPLIERS.values(),
+    ]
+    for box, (numerator, denominator) in itertools.product(CLIPPED, multipliers):
+        scaled = geometry.multiply(box, numerator, denominator, dimension)
+        assert (scaled.x, scaled.y) == (box.x, box.y)
+        width = box.width * numerator // denominator
+        height = box.height * numerator // denominator
+        assert scaled.width == (width if scale_width else box.width)
+        assert scaled.height == (height if scale_height else box.height)